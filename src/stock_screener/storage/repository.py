@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from functools import lru_cache
 import logging
 from pathlib import Path
 import re
@@ -13,6 +14,18 @@ from stock_screener.storage.db import db_session
 
 logger = logging.getLogger(__name__)
 
+_CHUNK_INDEX_RE = re.compile(r"chunk=(\d+)\s*/\s*(\d+)")
+
+
+@lru_cache(maxsize=None)
+def _quality_metric_patterns(key: str) -> tuple[re.Pattern[str], re.Pattern[str], re.Pattern[str]]:
+    escaped = re.escape(key)
+    return (
+        re.compile(rf"{escaped}=(\d+)\s*/\s*(\d+)"),
+        re.compile(rf"{escaped}=(\d+)"),
+        re.compile(rf"{escaped}_total=(\d+)"),
+    )
+
 
 class Repository:
     def __init__(self, db_path: str | Path):
@@ -29,12 +42,13 @@ class Repository:
         if not message:
             return None, None
 
-        slash_match = re.search(rf"{re.escape(key)}=(\d+)\s*/\s*(\d+)", message)
+        slash_re, value_re, total_re = _quality_metric_patterns(key)
+        slash_match = slash_re.search(message)
         if slash_match:
             return int(slash_match.group(1)), int(slash_match.group(2))
 
-        value_match = re.search(rf"{re.escape(key)}=(\d+)", message)
-        total_match = re.search(rf"{re.escape(key)}_total=(\d+)", message)
+        value_match = value_re.search(message)
+        total_match = total_re.search(message)
         if not value_match:
             return None, int(total_match.group(1)) if total_match else None
         return int(value_match.group(1)), int(total_match.group(1)) if total_match else None
@@ -43,7 +57,7 @@ class Repository:
     def _parse_chunk_index(message: str | None) -> tuple[int | None, int | None]:
         if not message:
             return None, None
-        match = re.search(r"chunk=(\d+)\s*/\s*(\d+)", message)
+        match = _CHUNK_INDEX_RE.search(message)
         if not match:
             return None, None
         return int(match.group(1)), int(match.group(2))
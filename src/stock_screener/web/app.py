@@ -1,33 +1,49 @@
 from __future__ import annotations
 
+import bisect
 import re
 import multiprocessing as mp
-import queue
 import time
 import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import urlencode
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from pykrx import stock
 
-from stock_screener.pipelines.daily_batch import BatchCancelledError, DailyBatchPipeline
 from stock_screener.backtest.config import BacktestConfig
 from stock_screener.backtest.engine import run_backtest
 from stock_screener.storage.db import init_db
 from stock_screener.storage.repository import Repository
 from stock_screener.web.filter_query import prune_query_filter_state
+from stock_screener.web.jobs import run_job
+from stock_screener.web.screening import apply_range_mode_mask as _apply_range_mode_mask
+from stock_screener.web.screening import category_isin_mask as _category_isin_mask
+from stock_screener.web.screening import prepare_snapshot_frame
+from stock_screener.web.screening import top_k_positions as _top_k_positions
 
 DB_PATH = Path("data/screener.db")
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-init_db(DB_PATH)
-repo = Repository(DB_PATH)
-pipeline = DailyBatchPipeline(DB_PATH)
+# Bounded wait right after submitting a job, and the active-job panel auto-refresh interval.
+JOB_SUBMIT_WAIT_SECONDS = 0.25
+JOB_PANEL_REFRESH_SECONDS = 2.0
+
+
+@st.cache_resource(show_spinner=False)
+def _get_repo() -> Repository:
+    # Schema setup and the repository run once per server process instead of once per session.
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    init_db(DB_PATH)
+    return Repository(DB_PATH)
+
 
 st.set_page_config(layout="wide", page_title="KR Fundamental Screener")
+repo = _get_repo()
 st.title("🇰🇷 한국 주식 Fundamental Screener (pykrx + SQLite cache)")
 st.caption("최초 실행 시 pykrx 수집으로 시간이 걸리며, 이후에는 DB snapshot을 재사용합니다.")
 st.caption("기본 asof = 최신 거래일(가격 데이터 기준), 해당 거래일 snapshot이 없으면 재계산이 필요합니다.")
@@ -38,6 +54,9 @@ if "incremental_job_mode" not in st.session_state:
     st.session_state.incremental_job_mode = "single_pass_with_snapshot"
 
 
+_TICKER_SPLIT_RE = re.compile(r"[\s,]+")
+
+
 @dataclass(frozen=True)
 class FilterSpec:
     name: str
@@ -365,10 +384,165 @@ FOREIGN_BUY_WINDOW_OPTIONS: dict[str, int] = {
     "60거래일": 60,
 }
 
+FUNDAMENTAL_AVAILABILITY_COLUMNS: tuple[str, ...] = (
+    "eps_cagr_5y",
+    "eps_yoy_q",
+    "eps_qoq",
+    "sales_growth_qoq",
+    "sales_growth_ttm",
+    "sales_cagr_5y",
+    "ev_ebitda",
+)
+TECHNICAL_AVAILABILITY_COLUMNS: tuple[str, ...] = (
+    "rsi_14",
+    "dist_sma20",
+    "dist_sma50",
+    "dist_sma200",
+    "near_52w_high_ratio",
+    "pos_52w",
+    "atr_14",
+    "gap_pct",
+    "chg_from_open_pct",
+    "volatility_20d",
+    "foreign_net_buy_volume",
+    "foreign_net_buy_volume_20d",
+    "foreign_net_buy_volume_60d",
+    "foreign_net_buy_value",
+    "foreign_net_buy_value_20d",
+    "foreign_net_buy_value_60d",
+    "foreign_net_buy_value_20d_mcap_ratio",
+    "foreign_net_buy_value_60d_mcap_ratio",
+)
+
+# Filters counted in the "Active filters" badge regardless of data availability.
+ACTIVE_COUNT_MODE_KEYS: tuple[str, ...] = (
+    "mcap_filter_mode",
+    "price_filter_mode",
+    "div_filter_mode",
+    "rsi_filter_mode",
+    "dist_sma20_filter_mode",
+    "dist_sma50_filter_mode",
+    "dist_sma200_filter_mode",
+    "near_high_filter_mode",
+    "near_low_filter_mode",
+    "atr_filter_mode",
+    "gap_filter_mode",
+    "chg_open_filter_mode",
+    "volatility_filter_mode",
+    "foreign_buy_filter_mode",
+)
+ACTIVE_COUNT_APPLY_KEYS: tuple[str, ...] = (
+    "apply_pbr_max",
+    "apply_reserve_ratio_min",
+    "apply_roe_min",
+    "apply_eps_positive",
+    "apply_eps_cagr_5y",
+    "apply_eps_yoy_q",
+    "apply_eps_qoq",
+    "apply_sales_growth_qoq",
+    "apply_sales_growth_ttm",
+    "apply_sales_cagr_5y",
+    "apply_has_price_5y",
+    "apply_has_price_10y",
+)
+# Single-threshold screen filters: (apply flag key, column, comparison, threshold key, positive only).
+# Flag and threshold keys are the widget session keys.
+THRESHOLD_FILTERS: tuple[tuple[str, str, str, str, bool], ...] = (
+    ("apply_pbr_max", "pbr", "<=", "pbr_max", True),
+    ("apply_reserve_ratio_min", "reserve_ratio", ">=", "reserve_ratio_min", False),
+    ("apply_roe_min", "roe_proxy", ">=", "roe_min", True),
+    ("apply_eps_cagr_5y", "eps_cagr_5y", ">=", "eps_cagr_5y_min", False),
+    ("apply_eps_yoy_q", "eps_yoy_q", ">=", "eps_yoy_q_min", False),
+    ("apply_eps_qoq", "eps_qoq", ">=", "eps_qoq_min", False),
+    ("apply_sales_growth_qoq", "sales_growth_qoq", ">=", "sales_growth_qoq_min", False),
+    ("apply_sales_growth_ttm", "sales_growth_ttm", ">=", "sales_growth_ttm_min", False),
+    ("apply_sales_cagr_5y", "sales_cagr_5y", ">=", "sales_cagr_5y_min", False),
+)
+THRESHOLD_COMPARATORS: dict[str, np.ufunc] = {">=": np.greater_equal, "<=": np.less_equal}
+
+# Display-only text columns held as Arrow strings (pyarrow ships with Streamlit). Numeric filter
+# columns stay NumPy-backed because the screen compares their raw ndarrays.
+SNAPSHOT_TEXT_COLUMNS: tuple[str, ...] = (
+    "ticker",
+    "name",
+    "fiscal_period",
+    "period_type",
+    "reported_date",
+    "consolidation_type",
+    "financial_source",
+)
+
+SCREEN_RESULT_COLUMNS: list[str] = [
+    "ticker", "name", "market", "close", "mcap", "avg_value_20d", "current_value", "relative_value", "pbr", "reserve_ratio", "per", "div", "dps",
+    "eps", "bps", "fiscal_period", "period_type", "reported_date", "consolidation_type", "financial_source", "roe_proxy", "eps_positive", "ret_3m", "ret_6m", "ret_1y",
+    "rsi_14", "dist_sma20", "dist_sma50", "dist_sma200", "pos_52w", "near_52w_high_ratio", "atr_14", "gap_pct", "chg_from_open_pct", "volatility_20d",
+    "foreign_net_buy_volume", "foreign_net_buy_volume_20d", "foreign_net_buy_volume_60d", "foreign_net_buy_value", "foreign_net_buy_value_20d", "foreign_net_buy_value_60d", "foreign_net_buy_value_20d_mcap_ratio", "foreign_net_buy_value_60d_mcap_ratio",
+    "eps_cagr_5y", "eps_yoy_q", "eps_qoq", "sales_growth_qoq", "sales_growth_ttm", "sales_cagr_5y", "pe_ratio", "forward_pe", "ps_ratio", "pb_ratio", "peg_ratio", "ev_sales", "ev_ebitda", "gross_margin", "operating_margin", "net_margin", "roa", "roe", "roic", "debt_equity", "lt_debt_equity", "current_ratio", "quick_ratio", "payout_ratio", "has_price_5y", "has_price_10y",
+]
+
 def _foreign_metric_for_window(window: int) -> str:
     return "foreign_net_buy_value_60d" if int(window) == 60 else "foreign_net_buy_value_20d"
 
 
+def _column_has_values(df: pd.DataFrame, col: str) -> bool:
+    return col in df.columns and bool(df[col].notna().any())
+
+
+def _snapshot_meta(df: pd.DataFrame) -> dict[str, Any]:
+    """Per-snapshot UI metadata: market options, normalized tickers and which metric filters have any data."""
+    return {
+        # prepare_snapshot_frame made market categorical, so its categories are the observed markets.
+        "markets": sorted(df["market"].cat.categories.tolist()),
+        # Tickers are unique per snapshot, so normalized ticker -> row position is one-to-one.
+        "ticker_positions": {ticker: pos for pos, ticker in enumerate(df["_ticker_norm"].tolist())},
+        "avg_value_available": _column_has_values(df, "avg_value_20d"),
+        "relative_value_available": _column_has_values(df, "relative_value"),
+        "available_momentum_metrics": [metric for metric in MOMENTUM_METRICS if _column_has_values(df, metric)],
+        "fundamental_metric_availability": {col: _column_has_values(df, col) for col in FUNDAMENTAL_AVAILABILITY_COLUMNS},
+        "technical_metric_availability": {col: _column_has_values(df, col) for col in TECHNICAL_AVAILABILITY_COLUMNS},
+    }
+
+
+def _db_mtime() -> float:
+    return DB_PATH.stat().st_mtime
+
+
+# cache_data hands each rerun its own copy, so no session can mutate another session's frame or
+# meta. Every DB write (new mtime) and every browsed asof adds a full prepared frame, so only the
+# most recent few are kept.
+@st.cache_data(ttl=3600, max_entries=3, show_spinner=False)
+def _load_snapshot_cached(db_path: str, asof: str, db_mtime: float) -> tuple[pd.DataFrame, dict[str, Any]]:
+    # db_path keys the frame per database file; db_mtime only participates in the cache key so
+    # pipeline writes invalidate stale frames.
+    df = prepare_snapshot_frame(Repository(Path(db_path)).load_snapshot(asof))
+    # Older snapshots may lack newer result columns; add them once here instead of per rerun.
+    missing_cols = [col for col in SCREEN_RESULT_COLUMNS if col not in df.columns]
+    if missing_cols:
+        df = df.reindex(columns=[*df.columns, *missing_cols])
+    for col in SNAPSHOT_TEXT_COLUMNS:
+        if col in df.columns and df[col].dtype == object:
+            df[col] = df[col].astype("string[pyarrow]")
+    return df, _snapshot_meta(df)
+
+
+# Each entry holds a full CSV; keep only the most recent filter states instead of growing unbounded.
+@st.cache_data(max_entries=4, show_spinner=False)
+def _csv_bytes(db_path: str, asof: str, db_mtime: float, tickers: tuple[str, ...], _frame: pd.DataFrame) -> bytes:
+    # _frame is excluded from hashing; the snapshot (db_path, asof, db_mtime) plus the ordered
+    # result tickers fully determine its contents.
+    return _frame.to_csv(index=False).encode("utf-8-sig")
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _latest_price_date(db_path: str, db_mtime: float) -> str | None:
+    return Repository(Path(db_path)).get_latest_price_date()
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _latest_snapshot_date(db_path: str, db_mtime: float) -> str | None:
+    return Repository(Path(db_path)).get_latest_snapshot_date()
+
+
 def _get_query_params() -> dict[str, Any]:
     if hasattr(st, "query_params"):
         return dict(st.query_params)
@@ -378,13 +552,32 @@ def _get_query_params() -> dict[str, Any]:
 def _set_query_params(params: dict[str, Any]) -> None:
     if hasattr(st, "query_params"):
         qp = st.query_params
-        qp.clear()
+        # Each assignment is sent to the browser, so only touch keys whose value actually changed.
+        for key in [key for key in qp.keys() if key not in params]:
+            del qp[key]
         for key, value in params.items():
-            qp[key] = value
+            current = qp.get_all(key) if isinstance(value, list) else qp.get(key)
+            if current != value:
+                qp[key] = value
         return
     st.experimental_set_query_params(**params)
 
 
+# Widget interactions inside a fragment rerun only the fragment, skipping the job/action section above it.
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+def _timed_fragment(run_every: float) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    fragment = getattr(st, "fragment", None)
+    return fragment(run_every=run_every) if fragment is not None else (lambda func: func)
+
+
+def _render_share_link(share_query_string: str) -> None:
+    share_link = f"?{share_query_string}" if share_query_string else ""
+    st.code(share_link or "(기본 필터 상태: 공유할 추가 파라미터 없음)", language="text")
+    st.button("공유 링크 복사", disabled=True, help="브라우저 주소창 URL을 복사해 공유하세요.")
+
+
 def _safe_rerun() -> None:
     if hasattr(st, "rerun"):
         st.rerun()
@@ -392,16 +585,20 @@ def _safe_rerun() -> None:
     st.experimental_rerun()
 
 
+_BOOL_MAP: dict[str, bool] = {
+    **{token: True for token in ("1", "true", "t", "yes", "y", "on")},
+    **{token: False for token in ("0", "false", "f", "no", "n", "off")},
+}
+
+
 def _parse_bool(raw: Any, *, default: bool) -> bool:
     if raw is None:
         return default
     value = raw[0] if isinstance(raw, list) and raw else raw
-    normalized = str(value).strip().lower()
-    if normalized in {"1", "true", "t", "yes", "y", "on"}:
-        return True
-    if normalized in {"0", "false", "f", "no", "n", "off"}:
-        return False
-    raise ValueError(f"invalid bool: {value}")
+    parsed = _BOOL_MAP.get(str(value).strip().lower())
+    if parsed is None:
+        raise ValueError(f"invalid bool: {value}")
+    return parsed
 
 
 def _parse_num(raw: Any, cast_type: type[int] | type[float], *, default: int | float) -> int | float:
@@ -429,120 +626,75 @@ def _parse_str(raw: Any, *, default: str) -> str:
     return str(raw)
 
 
-def _parse_query_filter_value(spec: FilterSpec, query_params: dict[str, Any]) -> Any:
-    raw = query_params.get(spec.name)
-    if spec.ftype == "bool":
-        return _parse_bool(raw, default=spec.default)
-    if spec.ftype == "int":
-        return _parse_num(raw, int, default=spec.default)
-    if spec.ftype == "float":
-        return _parse_num(raw, float, default=spec.default)
-    if spec.ftype == "list":
-        return _parse_list(raw, default=list(spec.default))
-    return _parse_str(raw, default=spec.default)
-
-
-def _serialize_query_filter_value(spec: FilterSpec, value: Any) -> str | list[str] | None:
-    if value == spec.default or value in (None, ""):
-        return None
-    if spec.ftype == "bool":
-        return "1" if bool(value) else "0"
-    if spec.ftype in {"int", "float", "str"}:
-        return str(value)
-    if spec.ftype == "list":
-        values = [str(item).strip() for item in value if str(item).strip()]
-        return values if values else None
-    return None
-
-
-def _job_worker(
-    db_path: str,
-    job_type: str,
-    asof_date: str | None,
-    lookback_days: int,
-    result_queue: mp.Queue,
-    run_options: dict[str, Any] | None = None,
-) -> None:
-    worker_pipeline = DailyBatchPipeline(Path(db_path))
-    run_options = run_options or {}
+QUERY_VALUE_PARSERS: dict[str, Callable[..., Any]] = {
+    "bool": _parse_bool,
+    "int": lambda raw, *, default: _parse_num(raw, int, default=default),
+    "float": lambda raw, *, default: _parse_num(raw, float, default=default),
+    "list": lambda raw, *, default: _parse_list(raw, default=list(default)),
+    "str": _parse_str,
+}
 
-    def should_cancel() -> bool:
-        cancel_flag = run_options.get("cancel_flag_path")
-        return bool(cancel_flag) and Path(cancel_flag).exists()
 
-    try:
-        if job_type in {"full_refresh", "initial_backfill"}:
-            initial_backfill = job_type == "initial_backfill"
-            if run_options.get("chunked_snapshot_strategy"):
-                result = worker_pipeline.run(
-                    asof_date=None,
-                    lookback_days=lookback_days,
-                    initial_backfill=initial_backfill,
-                    chunk_years=2,
-                    chunks=5,
-                    rebuild_snapshot=False,
-                    should_cancel=should_cancel,
-                )
-                snap_result = worker_pipeline.rebuild_snapshot_only(
-                    asof_date=result.asof_date,
-                    lookback_days=lookback_days,
-                )
-                result_queue.put(
-                    {
-                        "status": "success",
-                        "job_type": job_type,
-                        "result": result.__dict__,
-                        "chunks_done": 5,
-                        "total_chunks": 5,
-                        "snapshot_rebuilt": True,
-                        "snapshot_rows": snap_result.snapshot,
-                    }
-                )
-                return
+def _make_query_parser(spec: FilterSpec) -> Callable[[Any], Any]:
+    parse = QUERY_VALUE_PARSERS.get(spec.ftype, _parse_str)
+    default = spec.default
+    return lambda raw: parse(raw, default=default)
 
-            result = worker_pipeline.run(
-                asof_date=None,
-                lookback_days=lookback_days,
-                initial_backfill=initial_backfill,
-                should_cancel=should_cancel,
-            )
-            result_queue.put(
-                {
-                    "status": "success",
-                    "job_type": job_type,
-                    "result": result.__dict__,
-                    "chunks_done": 1,
-                    "total_chunks": 1,
-                    "snapshot_rebuilt": True,
-                    "snapshot_rows": result.snapshot,
-                }
-            )
-            return
-
-        if job_type in {"snapshot_refresh", "auto_snapshot_sync"}:
-            result = worker_pipeline.rebuild_snapshot_only(asof_date=asof_date, lookback_days=lookback_days)
-            result_queue.put({"status": "success", "job_type": job_type, "result": result.__dict__})
-            return
-
-        if job_type == "reserve_refresh":
-            updated_asof, updated_rows = worker_pipeline.update_reserve_ratio_only(asof_date=asof_date)
-            snap_result = worker_pipeline.rebuild_snapshot_only(asof_date=updated_asof, lookback_days=lookback_days)
-            result_queue.put(
-                {
-                    "status": "success",
-                    "job_type": job_type,
-                    "updated_asof": updated_asof,
-                    "updated_rows": updated_rows,
-                    "snapshot_rows": snap_result.snapshot,
-                }
-            )
-            return
 
-        result_queue.put({"status": "error", "job_type": job_type, "error": f"Unknown job type: {job_type}"})
-    except BatchCancelledError as exc:
-        result_queue.put({"status": "cancelled", "job_type": job_type, "message": str(exc)})
-    except Exception as exc:  # noqa: BLE001
-        result_queue.put({"status": "error", "job_type": job_type, "error": str(exc)})
+SPEC_PARSERS: list[tuple[FilterSpec, Callable[[Any], Any]]] = [(spec, _make_query_parser(spec)) for spec in FILTER_SPECS]
+
+
+def _serialize_list(value: Any) -> list[str] | None:
+    values = [str(item).strip() for item in value if str(item).strip()]
+    return values if values else None
+
+
+QUERY_VALUE_SERIALIZERS: dict[str, Callable[[Any], str | list[str] | None]] = {
+    "bool": lambda value: "1" if bool(value) else "0",
+    "int": str,
+    "float": str,
+    "str": str,
+    "list": _serialize_list,
+}
+
+
+def _make_query_serializer(spec: FilterSpec) -> Callable[[Any], str | list[str] | None]:
+    serialize = QUERY_VALUE_SERIALIZERS[spec.ftype]
+    default = spec.default
+    return lambda value: None if value == default or value in (None, "") else serialize(value)
+
+
+SPEC_SERIALIZERS: list[tuple[FilterSpec, Callable[[Any], str | list[str] | None]]] = [
+    (spec, _make_query_serializer(spec)) for spec in FILTER_SPECS if spec.ftype in QUERY_VALUE_SERIALIZERS
+]
+
+
+def _job_mp_context() -> mp.context.BaseContext:
+    # Never fork the Streamlit server. A forkserver preloads only the job module (pipeline, storage,
+    # collectors), so replacement workers start without re-importing them; spawn is the fallback.
+    if "forkserver" in mp.get_all_start_methods():
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["stock_screener.web.jobs"])
+        return ctx
+    return mp.get_context("spawn")
+
+
+# One long-lived worker process: after the first job, submissions skip process startup and the
+# pandas/pykrx imports. Workers import run_job from stock_screener.web.jobs.
+# The pool is shared by every browser session, so jobs from different sessions run one at a time
+# (which also keeps pipeline writes to the SQLite DB serialized); a session's job may sit queued.
+@st.cache_resource(show_spinner=False)
+def _get_job_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=1, mp_context=_job_mp_context())
+
+
+def _discard_job_executor(executor: ProcessPoolExecutor) -> None:
+    # Shut the broken pool down so its management thread and call queue are released and futures
+    # other sessions still hold from it resolve. Only drop the cached pool if no session has
+    # already replaced it.
+    executor.shutdown(wait=False, cancel_futures=True)
+    if _get_job_executor() is executor:
+        _get_job_executor.clear()
 
 
 def _start_background_job(
@@ -553,50 +705,69 @@ def _start_background_job(
     run_options: dict[str, Any] | None = None,
 ) -> None:
     active_job = st.session_state.get("active_job")
-    if active_job and active_job["process"].is_alive():
-        st.warning("다른 작업이 이미 실행 중입니다. 완료되거나 취소 후 다시 시도하세요.")
+    if active_job and not active_job["future"].done():
+        st.warning("이 세션의 작업이 아직 실행 중이거나 대기 중입니다. 완료되거나 취소 후 다시 시도하세요.")
         return
 
-    result_queue: mp.Queue = mp.Queue()
     run_lookback = int(lookback_days if lookback_days is not None else st.session_state.get("collect_lookback_days", 3650))
     run_options = dict(run_options or {})
     cancel_flag_path = str(DB_PATH.parent / f".cancel_{job_type}_{uuid.uuid4().hex}.flag")
     run_options["cancel_flag_path"] = cancel_flag_path
-    process = mp.Process(
-        target=_job_worker,
-        args=(str(DB_PATH), job_type, asof_date, run_lookback, result_queue, run_options),
-        daemon=True,
-    )
-    process.start()
+    job_args = (str(DB_PATH), job_type, asof_date, run_lookback, run_options)
+    executor = _get_job_executor()
+    try:
+        future = executor.submit(run_job, *job_args)
+    except BrokenProcessPool:
+        # The worker died (e.g. killed by the OS); replace the pool once and resubmit.
+        _discard_job_executor(executor)
+        executor = _get_job_executor()
+        future = executor.submit(run_job, *job_args)
     st.session_state.active_job = {
         "job_type": job_type,
         "label": label,
         "asof_date": asof_date,
-        "process": process,
-        "result_queue": result_queue,
+        "future": future,
+        "executor": executor,
         "started_at": time.time(),
         "lookback_days": run_lookback,
         "cancel_flag_path": cancel_flag_path,
         "cancel_requested": False,
     }
+    # Short jobs (e.g. a snapshot rebuild on a warm DB) finish within the wait and are reported on
+    # the very next rerun instead of after a refresh.
+    _poll_background_job(timeout=JOB_SUBMIT_WAIT_SECONDS)
 
 
-def _poll_background_job() -> None:
+def _poll_background_job(timeout: float = 0.0) -> None:
     active_job = st.session_state.get("active_job")
     if not active_job:
         return
 
-    process = active_job["process"]
-    result_queue = active_job["result_queue"]
-    if process.is_alive():
+    future = active_job["future"]
+    # The per-rerun check is a plain done() flag read; only the post-submit check blocks briefly.
+    if not future.done() and (timeout <= 0 or not wait([future], timeout=timeout).done):
         return
 
-    process.join(timeout=0.2)
     message: dict[str, Any]
     try:
-        message = result_queue.get_nowait()
-    except queue.Empty:
+        message = future.result()
+    except CancelledError:
+        message = {
+            "status": "cancelled",
+            "job_type": active_job["job_type"],
+            "message": f"{active_job['label']} 작업이 취소되었습니다.",
+        }
+    except BrokenProcessPool:
+        _discard_job_executor(active_job["executor"])
         message = {"status": "error", "job_type": active_job["job_type"], "error": "작업 결과를 읽지 못했습니다."}
+    except Exception as exc:  # noqa: BLE001
+        # Anything the worker could not report itself (e.g. an unpicklable result) still has to
+        # clear active_job, otherwise the session keeps re-raising on every rerun.
+        message = {
+            "status": "error",
+            "job_type": active_job["job_type"],
+            "error": f"작업 결과를 읽지 못했습니다: {exc}",
+        }
 
     cancel_flag = active_job.get("cancel_flag_path")
     if cancel_flag and Path(cancel_flag).exists():
@@ -606,6 +777,12 @@ def _poll_background_job() -> None:
     st.session_state.active_job = None
 
     if message.get("status") == "success":
+        # The mtime key already misses after a write; clearing also drops the stale frames from memory.
+        _load_snapshot_cached.clear()
+        _csv_bytes.clear()
+        _latest_price_date.clear()
+        _latest_snapshot_date.clear()
+        st.session_state.pop("_last_sync_check", None)
         if message.get("job_type") in {"full_refresh", "initial_backfill", "snapshot_refresh", "auto_snapshot_sync"}:
             result = message.get("result", {})
             st.session_state.asof = result.get("asof_date")
@@ -615,20 +792,36 @@ def _poll_background_job() -> None:
             st.session_state.asof = message.get("updated_asof")
 
 
+# Reruns only this panel while a job is active, so completion is picked up without a click.
+@_timed_fragment(run_every=JOB_PANEL_REFRESH_SECONDS)
 def _render_active_job_panel() -> None:
     active_job = st.session_state.get("active_job")
     if not active_job:
         return
+    if active_job["future"].done():
+        _safe_rerun()
 
     elapsed = int(time.time() - active_job["started_at"])
-    cancel_suffix = " | 취소 요청됨(다음 안전 체크포인트에서 중단)" if active_job.get("cancel_requested") else ""
-    st.info(f"{active_job['label']} 실행 중... ({elapsed}초 경과){cancel_suffix}")
+    if not active_job["future"].running():
+        # Jobs from all sessions share one worker, so this job waits for however long the other
+        # sessions' jobs take.
+        st.info(
+            f"{active_job['label']} 대기 중... 다른 세션의 작업이 끝나야 시작되며, 그 작업이 길면 계속 대기할 수 있습니다. "
+            f"취소하면 바로 대기열에서 빠집니다. ({elapsed}초 경과)"
+        )
+    else:
+        cancel_suffix = " | 취소 요청됨(다음 안전 체크포인트에서 중단)" if active_job.get("cancel_requested") else ""
+        st.info(f"{active_job['label']} 실행 중... ({elapsed}초 경과){cancel_suffix}")
     c1, c2 = st.columns([1, 1])
     with c1:
         if st.button("진행상태 새로고침", key="refresh_active_job"):
             _safe_rerun()
     with c2:
         if st.button("작업 취소", type="secondary", key="cancel_active_job"):
+            # A job still queued behind another session's job is dropped outright; the next poll
+            # reports it as cancelled. Only a running job needs the cooperative cancel flag.
+            if active_job["future"].cancel():
+                _safe_rerun()
             cancel_flag = active_job.get("cancel_flag_path")
             if cancel_flag:
                 Path(cancel_flag).touch()
@@ -647,6 +840,70 @@ def _reset_all_filters() -> None:
         st.session_state[spec.name] = spec.default
 
 
+# (session key, allowed values, fallback) checked after URL restore and on every rerun.
+FILTER_STATE_VALIDATORS: tuple[tuple[str, Any, Any], ...] = (
+    ("mcap_filter_mode", MCAP_MODES, "Any"),
+    ("price_filter_mode", PRICE_MODES, "Any"),
+    ("div_filter_mode", DIV_MODES, "Any"),
+    ("value_filter_mode", VALUE_MODES, "Any"),
+    ("relvol_filter_mode", RELVOL_MODES, "Any"),
+    ("momentum_filter_mode", MOMENTUM_MODES, "Any"),
+    ("ev_ebitda_filter_mode", EV_EBITDA_MODES, "Any"),
+    ("rsi_filter_mode", RSI_MODES, "Any"),
+    ("atr_filter_mode", ATR_MODES, "Any"),
+    ("gap_filter_mode", GAP_MODES, "Any"),
+    ("chg_open_filter_mode", CHG_OPEN_MODES, "Any"),
+    ("volatility_filter_mode", VOLATILITY_MODES, "Any"),
+    ("foreign_buy_filter_mode", FOREIGN_BUY_MODES, "Any"),
+    ("dist_sma20_filter_mode", RSI_MODES, "Any"),
+    ("dist_sma50_filter_mode", RSI_MODES, "Any"),
+    ("dist_sma200_filter_mode", RSI_MODES, "Any"),
+    ("near_high_filter_mode", RSI_MODES, "Any"),
+    ("near_low_filter_mode", RSI_MODES, "Any"),
+    ("mcap_bucket", MCAP_BUCKETS, "전체"),
+    ("price_bucket", PRICE_BUCKETS, "전체"),
+    ("div_bucket", DIV_BUCKETS, "전체"),
+    ("value_bucket", VALUE_BUCKETS, "전체"),
+    ("relvol_bucket", RELVOL_BUCKETS, "전체"),
+    ("momentum_bucket", MOMENTUM_BUCKETS, "전체"),
+    ("ev_ebitda_bucket", EV_EBITDA_BUCKETS, "전체"),
+    ("rsi_bucket", RSI_BUCKETS, "전체"),
+    ("atr_bucket", ATR_BUCKETS, "전체"),
+    ("gap_bucket", GAP_BUCKETS, "전체"),
+    ("chg_open_bucket", CHG_OPEN_BUCKETS, "전체"),
+    ("volatility_bucket", VOLATILITY_BUCKETS, "전체"),
+    ("dist_sma20_bucket", DIST_SMA_BUCKETS, "전체"),
+    ("dist_sma50_bucket", DIST_SMA_BUCKETS, "전체"),
+    ("dist_sma200_bucket", DIST_SMA_BUCKETS, "전체"),
+    ("near_high_bucket", NEAR_HIGH_BUCKETS, "전체"),
+    ("near_low_bucket", NEAR_LOW_BUCKETS, "전체"),
+    ("momentum_metric", MOMENTUM_METRICS, "ret_3m"),
+)
+
+
+def _validate_filter_state(errors: list[str] | None = None) -> None:
+    """Reset out-of-range mode/bucket selections to their fallback, recording keys in `errors`."""
+    state = st.session_state
+    for key, allowed, fallback in FILTER_STATE_VALIDATORS:
+        if state.get(key) not in allowed:
+            state[key] = fallback
+            if errors is not None:
+                errors.append(key)
+    foreign_buy_bucket_options = FOREIGN_BUY_METRIC_CONFIGS.get(
+        _foreign_metric_for_window(int(state.get("foreign_buy_window", 20))),
+        FOREIGN_BUY_METRIC_CONFIGS["foreign_net_buy_value_20d"],
+    )["bucket_options"]
+    if state.get("foreign_buy_bucket") not in foreign_buy_bucket_options:
+        state.foreign_buy_bucket = "전체"
+        if errors is not None:
+            errors.append("foreign_buy_bucket")
+    if int(state.get("foreign_buy_window", 20)) not in (20, 60):
+        state.foreign_buy_window = 20
+        if errors is not None:
+            errors.append("foreign_buy_window")
+    state.foreign_buy_metric = _foreign_metric_for_window(int(state.get("foreign_buy_window", 20)))
+
+
 def _format_range_summary(mode: str, bucket: str, min_custom: float, max_custom: float) -> str:
     if mode == "구간 선택":
         return bucket
@@ -808,38 +1065,6 @@ def _render_technical_range_filter(
     return mode, bucket, min_custom, max_custom
 
 
-def _apply_range_mode_filter(
-    frame,
-    *,
-    col: str,
-    mode: str,
-    bucket: str,
-    bucket_map: dict[str, tuple[float | None, float | None]],
-    min_custom: float,
-    max_custom: float,
-    exclude_zero: bool = False,
-):
-    if mode == "Any":
-        return frame
-    scoped = frame[frame[col].notna()]
-    if exclude_zero:
-        scoped = scoped[scoped[col] != 0]
-    if mode == "구간 선택":
-        lower, upper = bucket_map.get(bucket, (None, None))
-        if lower is not None:
-            scoped = scoped[scoped[col] >= lower]
-        if upper is not None:
-            scoped = scoped[scoped[col] <= upper]
-        return scoped
-    if mode == "직접 입력":
-        if min_custom != 0:
-            scoped = scoped[scoped[col] >= min_custom]
-        if max_custom != 0:
-            scoped = scoped[scoped[col] <= max_custom]
-        return scoped
-    return frame
-
-
 def _render_momentum_filter(*, row_disabled: bool = False) -> tuple[str, str, str, float, float]:
     st.markdown("#### 강도")
     row1_cols = st.columns(4)
@@ -944,134 +1169,19 @@ if "query_params_restored" not in st.session_state:
         if new_key not in query_params and legacy_key in query_params:
             query_params[new_key] = query_params[legacy_key]
 
-    for spec in FILTER_SPECS:
+    for spec, parser in SPEC_PARSERS:
+        raw = query_params.get(spec.name)
+        # Most specs are absent from a shared URL; skip the parser dispatch and restore the default.
+        if raw is None:
+            st.session_state[spec.name] = spec.default
+            continue
         try:
-            st.session_state[spec.name] = _parse_query_filter_value(spec, query_params)
+            st.session_state[spec.name] = parser(raw)
         except ValueError:
             st.session_state[spec.name] = spec.default
             st.session_state.query_parse_errors.append(spec.name)
 
-    if st.session_state.get("mcap_filter_mode") not in MCAP_MODES:
-        st.session_state.mcap_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("mcap_filter_mode")
-    if st.session_state.get("price_filter_mode") not in PRICE_MODES:
-        st.session_state.price_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("price_filter_mode")
-    if st.session_state.get("div_filter_mode") not in DIV_MODES:
-        st.session_state.div_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("div_filter_mode")
-    if st.session_state.get("value_filter_mode") not in VALUE_MODES:
-        st.session_state.value_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("value_filter_mode")
-    if st.session_state.get("relvol_filter_mode") not in RELVOL_MODES:
-        st.session_state.relvol_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("relvol_filter_mode")
-    if st.session_state.get("momentum_filter_mode") not in MOMENTUM_MODES:
-        st.session_state.momentum_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("momentum_filter_mode")
-    if st.session_state.get("ev_ebitda_filter_mode") not in EV_EBITDA_MODES:
-        st.session_state.ev_ebitda_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("ev_ebitda_filter_mode")
-    if st.session_state.get("rsi_filter_mode") not in RSI_MODES:
-        st.session_state.rsi_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("rsi_filter_mode")
-    if st.session_state.get("atr_filter_mode") not in ATR_MODES:
-        st.session_state.atr_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("atr_filter_mode")
-    if st.session_state.get("gap_filter_mode") not in GAP_MODES:
-        st.session_state.gap_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("gap_filter_mode")
-    if st.session_state.get("chg_open_filter_mode") not in CHG_OPEN_MODES:
-        st.session_state.chg_open_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("chg_open_filter_mode")
-    if st.session_state.get("volatility_filter_mode") not in VOLATILITY_MODES:
-        st.session_state.volatility_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("volatility_filter_mode")
-    if st.session_state.get("foreign_buy_filter_mode") not in FOREIGN_BUY_MODES:
-        st.session_state.foreign_buy_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("foreign_buy_filter_mode")
-    if st.session_state.get("dist_sma20_filter_mode") not in RSI_MODES:
-        st.session_state.dist_sma20_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("dist_sma20_filter_mode")
-    if st.session_state.get("dist_sma50_filter_mode") not in RSI_MODES:
-        st.session_state.dist_sma50_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("dist_sma50_filter_mode")
-    if st.session_state.get("dist_sma200_filter_mode") not in RSI_MODES:
-        st.session_state.dist_sma200_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("dist_sma200_filter_mode")
-    if st.session_state.get("near_high_filter_mode") not in RSI_MODES:
-        st.session_state.near_high_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("near_high_filter_mode")
-    if st.session_state.get("near_low_filter_mode") not in RSI_MODES:
-        st.session_state.near_low_filter_mode = "Any"
-        st.session_state.query_parse_errors.append("near_low_filter_mode")
-
-    if st.session_state.get("mcap_bucket") not in MCAP_BUCKETS:
-        st.session_state.mcap_bucket = "전체"
-        st.session_state.query_parse_errors.append("mcap_bucket")
-    if st.session_state.get("price_bucket") not in PRICE_BUCKETS:
-        st.session_state.price_bucket = "전체"
-        st.session_state.query_parse_errors.append("price_bucket")
-    if st.session_state.get("div_bucket") not in DIV_BUCKETS:
-        st.session_state.div_bucket = "전체"
-        st.session_state.query_parse_errors.append("div_bucket")
-    if st.session_state.get("value_bucket") not in VALUE_BUCKETS:
-        st.session_state.value_bucket = "전체"
-        st.session_state.query_parse_errors.append("value_bucket")
-    if st.session_state.get("relvol_bucket") not in RELVOL_BUCKETS:
-        st.session_state.relvol_bucket = "전체"
-        st.session_state.query_parse_errors.append("relvol_bucket")
-    if st.session_state.get("momentum_bucket") not in MOMENTUM_BUCKETS:
-        st.session_state.momentum_bucket = "전체"
-        st.session_state.query_parse_errors.append("momentum_bucket")
-    if st.session_state.get("ev_ebitda_bucket") not in EV_EBITDA_BUCKETS:
-        st.session_state.ev_ebitda_bucket = "전체"
-        st.session_state.query_parse_errors.append("ev_ebitda_bucket")
-    if st.session_state.get("rsi_bucket") not in RSI_BUCKETS:
-        st.session_state.rsi_bucket = "전체"
-        st.session_state.query_parse_errors.append("rsi_bucket")
-    if st.session_state.get("atr_bucket") not in ATR_BUCKETS:
-        st.session_state.atr_bucket = "전체"
-        st.session_state.query_parse_errors.append("atr_bucket")
-    if st.session_state.get("gap_bucket") not in GAP_BUCKETS:
-        st.session_state.gap_bucket = "전체"
-        st.session_state.query_parse_errors.append("gap_bucket")
-    if st.session_state.get("chg_open_bucket") not in CHG_OPEN_BUCKETS:
-        st.session_state.chg_open_bucket = "전체"
-        st.session_state.query_parse_errors.append("chg_open_bucket")
-    if st.session_state.get("volatility_bucket") not in VOLATILITY_BUCKETS:
-        st.session_state.volatility_bucket = "전체"
-        st.session_state.query_parse_errors.append("volatility_bucket")
-    foreign_buy_metric_for_bucket = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-    foreign_buy_bucket_options = FOREIGN_BUY_METRIC_CONFIGS.get(
-        foreign_buy_metric_for_bucket,
-        FOREIGN_BUY_METRIC_CONFIGS["foreign_net_buy_value_20d"],
-    )["bucket_options"]
-    if st.session_state.get("foreign_buy_bucket") not in foreign_buy_bucket_options:
-        st.session_state.foreign_buy_bucket = "전체"
-        st.session_state.query_parse_errors.append("foreign_buy_bucket")
-    if st.session_state.get("dist_sma20_bucket") not in DIST_SMA_BUCKETS:
-        st.session_state.dist_sma20_bucket = "전체"
-        st.session_state.query_parse_errors.append("dist_sma20_bucket")
-    if st.session_state.get("dist_sma50_bucket") not in DIST_SMA_BUCKETS:
-        st.session_state.dist_sma50_bucket = "전체"
-        st.session_state.query_parse_errors.append("dist_sma50_bucket")
-    if st.session_state.get("dist_sma200_bucket") not in DIST_SMA_BUCKETS:
-        st.session_state.dist_sma200_bucket = "전체"
-        st.session_state.query_parse_errors.append("dist_sma200_bucket")
-    if st.session_state.get("near_high_bucket") not in NEAR_HIGH_BUCKETS:
-        st.session_state.near_high_bucket = "전체"
-        st.session_state.query_parse_errors.append("near_high_bucket")
-    if st.session_state.get("near_low_bucket") not in NEAR_LOW_BUCKETS:
-        st.session_state.near_low_bucket = "전체"
-        st.session_state.query_parse_errors.append("near_low_bucket")
-    if st.session_state.get("momentum_metric") not in MOMENTUM_METRICS:
-        st.session_state.momentum_metric = "ret_3m"
-        st.session_state.query_parse_errors.append("momentum_metric")
-    if int(st.session_state.get("foreign_buy_window", 20)) not in (20, 60):
-        st.session_state.foreign_buy_window = 20
-        st.session_state.query_parse_errors.append("foreign_buy_window")
-    st.session_state.foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+    _validate_filter_state(st.session_state.query_parse_errors)
 
     st.session_state.query_params_restored = True
 
@@ -1081,89 +1191,7 @@ if st.session_state.get("query_parse_errors"):
         + ", ".join(st.session_state.query_parse_errors)
     )
 
-if st.session_state.get("mcap_filter_mode") not in MCAP_MODES:
-    st.session_state.mcap_filter_mode = "Any"
-if st.session_state.get("price_filter_mode") not in PRICE_MODES:
-    st.session_state.price_filter_mode = "Any"
-if st.session_state.get("div_filter_mode") not in DIV_MODES:
-    st.session_state.div_filter_mode = "Any"
-if st.session_state.get("value_filter_mode") not in VALUE_MODES:
-    st.session_state.value_filter_mode = "Any"
-if st.session_state.get("relvol_filter_mode") not in RELVOL_MODES:
-    st.session_state.relvol_filter_mode = "Any"
-if st.session_state.get("momentum_filter_mode") not in MOMENTUM_MODES:
-    st.session_state.momentum_filter_mode = "Any"
-if st.session_state.get("ev_ebitda_filter_mode") not in EV_EBITDA_MODES:
-    st.session_state.ev_ebitda_filter_mode = "Any"
-if st.session_state.get("rsi_filter_mode") not in RSI_MODES:
-    st.session_state.rsi_filter_mode = "Any"
-if st.session_state.get("atr_filter_mode") not in ATR_MODES:
-    st.session_state.atr_filter_mode = "Any"
-if st.session_state.get("gap_filter_mode") not in GAP_MODES:
-    st.session_state.gap_filter_mode = "Any"
-if st.session_state.get("chg_open_filter_mode") not in CHG_OPEN_MODES:
-    st.session_state.chg_open_filter_mode = "Any"
-if st.session_state.get("volatility_filter_mode") not in VOLATILITY_MODES:
-    st.session_state.volatility_filter_mode = "Any"
-if st.session_state.get("foreign_buy_filter_mode") not in FOREIGN_BUY_MODES:
-    st.session_state.foreign_buy_filter_mode = "Any"
-if st.session_state.get("dist_sma20_filter_mode") not in RSI_MODES:
-    st.session_state.dist_sma20_filter_mode = "Any"
-if st.session_state.get("dist_sma50_filter_mode") not in RSI_MODES:
-    st.session_state.dist_sma50_filter_mode = "Any"
-if st.session_state.get("dist_sma200_filter_mode") not in RSI_MODES:
-    st.session_state.dist_sma200_filter_mode = "Any"
-if st.session_state.get("near_high_filter_mode") not in RSI_MODES:
-    st.session_state.near_high_filter_mode = "Any"
-if st.session_state.get("near_low_filter_mode") not in RSI_MODES:
-    st.session_state.near_low_filter_mode = "Any"
-
-if st.session_state.get("mcap_bucket") not in MCAP_BUCKETS:
-    st.session_state.mcap_bucket = "전체"
-if st.session_state.get("price_bucket") not in PRICE_BUCKETS:
-    st.session_state.price_bucket = "전체"
-if st.session_state.get("div_bucket") not in DIV_BUCKETS:
-    st.session_state.div_bucket = "전체"
-if st.session_state.get("value_bucket") not in VALUE_BUCKETS:
-    st.session_state.value_bucket = "전체"
-if st.session_state.get("relvol_bucket") not in RELVOL_BUCKETS:
-    st.session_state.relvol_bucket = "전체"
-if st.session_state.get("momentum_bucket") not in MOMENTUM_BUCKETS:
-    st.session_state.momentum_bucket = "전체"
-if st.session_state.get("ev_ebitda_bucket") not in EV_EBITDA_BUCKETS:
-    st.session_state.ev_ebitda_bucket = "전체"
-if st.session_state.get("rsi_bucket") not in RSI_BUCKETS:
-    st.session_state.rsi_bucket = "전체"
-if st.session_state.get("atr_bucket") not in ATR_BUCKETS:
-    st.session_state.atr_bucket = "전체"
-if st.session_state.get("gap_bucket") not in GAP_BUCKETS:
-    st.session_state.gap_bucket = "전체"
-if st.session_state.get("chg_open_bucket") not in CHG_OPEN_BUCKETS:
-    st.session_state.chg_open_bucket = "전체"
-if st.session_state.get("volatility_bucket") not in VOLATILITY_BUCKETS:
-    st.session_state.volatility_bucket = "전체"
-foreign_buy_metric_for_bucket = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-foreign_buy_bucket_options = FOREIGN_BUY_METRIC_CONFIGS.get(
-    foreign_buy_metric_for_bucket,
-    FOREIGN_BUY_METRIC_CONFIGS["foreign_net_buy_value_20d"],
-)["bucket_options"]
-if st.session_state.get("foreign_buy_bucket") not in foreign_buy_bucket_options:
-    st.session_state.foreign_buy_bucket = "전체"
-if st.session_state.get("dist_sma20_bucket") not in DIST_SMA_BUCKETS:
-    st.session_state.dist_sma20_bucket = "전체"
-if st.session_state.get("dist_sma50_bucket") not in DIST_SMA_BUCKETS:
-    st.session_state.dist_sma50_bucket = "전체"
-if st.session_state.get("dist_sma200_bucket") not in DIST_SMA_BUCKETS:
-    st.session_state.dist_sma200_bucket = "전체"
-if st.session_state.get("near_high_bucket") not in NEAR_HIGH_BUCKETS:
-    st.session_state.near_high_bucket = "전체"
-if st.session_state.get("near_low_bucket") not in NEAR_LOW_BUCKETS:
-    st.session_state.near_low_bucket = "전체"
-if st.session_state.get("momentum_metric") not in MOMENTUM_METRICS:
-    st.session_state.momentum_metric = "ret_3m"
-if int(st.session_state.get("foreign_buy_window", 20)) not in (20, 60):
-    st.session_state.foreign_buy_window = 20
-st.session_state.foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+_validate_filter_state()
 
 _poll_background_job()
 
@@ -1200,19 +1228,30 @@ if last_job_message:
     else:
         st.error(f"작업 실패({job_type}): {last_job_message.get('error', '알 수 없는 오류')}")
 
+# One stat() per script run; every cached DB lookup below keys on the same mtime.
+db_path = str(DB_PATH)
+db_mtime = _db_mtime()
 if "asof" not in st.session_state:
-    st.session_state.asof = repo.get_latest_price_date() or repo.get_latest_snapshot_date()
-
-latest_price_date = repo.get_latest_price_date()
-latest_snapshot_date = repo.get_latest_snapshot_date()
-if latest_price_date and latest_price_date != latest_snapshot_date:
-    auto_sync_target = latest_price_date
+    st.session_state.asof = _latest_price_date(db_path, db_mtime) or _latest_snapshot_date(db_path, db_mtime)
+
+# The price/snapshot dates almost always match, so only re-check them once a minute.
+sync_checked_at = time.monotonic()
+if sync_checked_at - st.session_state.get("_last_sync_check", 0.0) > 60:
+    latest_price_date = _latest_price_date(db_path, db_mtime)
+    latest_snapshot_date = _latest_snapshot_date(db_path, db_mtime)
+    st.session_state._sync_target = (
+        latest_price_date if latest_price_date and latest_price_date != latest_snapshot_date else None
+    )
+    st.session_state._last_sync_check = sync_checked_at
+auto_sync_target = st.session_state.get("_sync_target")
+if auto_sync_target:
     active_job = st.session_state.get("active_job")
     if st.session_state.get("auto_snapshot_synced_for") != auto_sync_target and not active_job:
         _start_background_job("auto_snapshot_sync", "최신 거래일 snapshot 자동 동기화", auto_sync_target)
         _safe_rerun()
 
-_render_active_job_panel()
+if st.session_state.get("active_job"):
+    _render_active_job_panel()
 
 st.markdown("### 수집 설정")
 setting_cols = st.columns([1, 1, 2])
@@ -1261,11 +1300,11 @@ if refresh_incremental:
     _safe_rerun()
 
 if refresh_snapshot:
-    _start_background_job("snapshot_refresh", "스냅샷 재계산", repo.get_latest_price_date())
+    _start_background_job("snapshot_refresh", "스냅샷 재계산", _latest_price_date(db_path, db_mtime))
     _safe_rerun()
 
 if refresh_reserve:
-    _start_background_job("reserve_refresh", "유보율 업데이트 + 스냅샷 재계산", repo.get_latest_price_date())
+    _start_background_job("reserve_refresh", "유보율 업데이트 + 스냅샷 재계산", _latest_price_date(db_path, db_mtime))
     _safe_rerun()
 
 asof = st.session_state.asof
@@ -1273,36 +1312,7 @@ if not asof:
     st.warning("snapshot이 없습니다. 먼저 '초기 백필 + 스냅샷' 또는 '일일 증분 + 스냅샷' 또는 '스냅샷만 재계산' 버튼을 실행하세요. (Technical 외국인 스크리닝 UI는 snapshot 생성 후 표시됩니다)")
     st.stop()
 
-base = repo.load_snapshot(asof)
-if "foreign_net_buy_value_20d_mcap_ratio" not in base.columns:
-    base["foreign_net_buy_value_20d_mcap_ratio"] = pd.NA
-if "foreign_net_buy_value_60d_mcap_ratio" not in base.columns:
-    base["foreign_net_buy_value_60d_mcap_ratio"] = pd.NA
-mcap_ratio_mask_20d = (
-    base["foreign_net_buy_value_20d"].notna()
-    & base["mcap"].notna()
-    & (base["mcap"] != 0)
-)
-base.loc[mcap_ratio_mask_20d, "foreign_net_buy_value_20d_mcap_ratio"] = (
-    base.loc[mcap_ratio_mask_20d, "foreign_net_buy_value_20d"]
-    / base.loc[mcap_ratio_mask_20d, "mcap"]
-    * 100.0
-)
-mcap_ratio_mask_60d = (
-    "foreign_net_buy_value_60d" in base.columns
-    and base["foreign_net_buy_value_60d"].notna().any()
-)
-if mcap_ratio_mask_60d:
-    ratio_mask_60d = (
-        base["foreign_net_buy_value_60d"].notna()
-        & base["mcap"].notna()
-        & (base["mcap"] != 0)
-    )
-    base.loc[ratio_mask_60d, "foreign_net_buy_value_60d_mcap_ratio"] = (
-        base.loc[ratio_mask_60d, "foreign_net_buy_value_60d"]
-        / base.loc[ratio_mask_60d, "mcap"]
-        * 100.0
-    )
+base, snapshot_meta = _load_snapshot_cached(db_path, asof, db_mtime)
 if base.empty:
     st.warning(
         "해당 거래일 스냅샷이 없습니다. '스냅샷만 재계산' 버튼으로 스냅샷 재계산이 필요합니다."
@@ -1318,1366 +1328,1364 @@ st.caption(
     f" ({financial_meta.get('period_type') or '-'})"
 )
 
-st.markdown("### 조건 선택")
-st.caption("조건은 Any + 임계치 방식으로 설정되며, 계산 불가한 항목은 자동 비활성화됩니다.")
-
-avg_value_available = "avg_value_20d" in base.columns and base["avg_value_20d"].notna().any()
-relative_value_available = "relative_value" in base.columns and base["relative_value"].notna().any()
-available_momentum_metrics = [metric for metric in MOMENTUM_METRICS if metric in base.columns and base[metric].notna().any()]
-momentum_available = bool(available_momentum_metrics)
-
-fundamental_metric_availability = {
-    "eps_cagr_5y": "eps_cagr_5y" in base.columns and base["eps_cagr_5y"].notna().any(),
-    "eps_yoy_q": "eps_yoy_q" in base.columns and base["eps_yoy_q"].notna().any(),
-    "eps_qoq": "eps_qoq" in base.columns and base["eps_qoq"].notna().any(),
-    "sales_growth_qoq": "sales_growth_qoq" in base.columns and base["sales_growth_qoq"].notna().any(),
-    "sales_growth_ttm": "sales_growth_ttm" in base.columns and base["sales_growth_ttm"].notna().any(),
-    "sales_cagr_5y": "sales_cagr_5y" in base.columns and base["sales_cagr_5y"].notna().any(),
-    "ev_ebitda": "ev_ebitda" in base.columns and base["ev_ebitda"].notna().any(),
-}
-technical_metric_availability = {
-    "rsi_14": "rsi_14" in base.columns and base["rsi_14"].notna().any(),
-    "dist_sma20": "dist_sma20" in base.columns and base["dist_sma20"].notna().any(),
-    "dist_sma50": "dist_sma50" in base.columns and base["dist_sma50"].notna().any(),
-    "dist_sma200": "dist_sma200" in base.columns and base["dist_sma200"].notna().any(),
-    "near_52w_high_ratio": "near_52w_high_ratio" in base.columns and base["near_52w_high_ratio"].notna().any(),
-    "pos_52w": "pos_52w" in base.columns and base["pos_52w"].notna().any(),
-    "atr_14": "atr_14" in base.columns and base["atr_14"].notna().any(),
-    "gap_pct": "gap_pct" in base.columns and base["gap_pct"].notna().any(),
-    "chg_from_open_pct": "chg_from_open_pct" in base.columns and base["chg_from_open_pct"].notna().any(),
-    "volatility_20d": "volatility_20d" in base.columns and base["volatility_20d"].notna().any(),
-    "foreign_net_buy_volume": "foreign_net_buy_volume" in base.columns and base["foreign_net_buy_volume"].notna().any(),
-    "foreign_net_buy_volume_20d": "foreign_net_buy_volume_20d" in base.columns and base["foreign_net_buy_volume_20d"].notna().any(),
-    "foreign_net_buy_volume_60d": "foreign_net_buy_volume_60d" in base.columns and base["foreign_net_buy_volume_60d"].notna().any(),
-    "foreign_net_buy_value": "foreign_net_buy_value" in base.columns and base["foreign_net_buy_value"].notna().any(),
-    "foreign_net_buy_value_20d": "foreign_net_buy_value_20d" in base.columns and base["foreign_net_buy_value_20d"].notna().any(),
-    "foreign_net_buy_value_60d": "foreign_net_buy_value_60d" in base.columns and base["foreign_net_buy_value_60d"].notna().any(),
-    "foreign_net_buy_value_20d_mcap_ratio": "foreign_net_buy_value_20d_mcap_ratio" in base.columns and base["foreign_net_buy_value_20d_mcap_ratio"].notna().any(),
-    "foreign_net_buy_value_60d_mcap_ratio": "foreign_net_buy_value_60d_mcap_ratio" in base.columns and base["foreign_net_buy_value_60d_mcap_ratio"].notna().any(),
-}
-
-def _active_filter_count_from_state() -> int:
-    return sum(
-        [
-            int(bool([token.strip() for token in re.split(r"[\s,]+", st.session_state.get("ticker_input", "") or "") if token.strip()])),
-            int(bool(st.session_state.get("mkt", []))),
-            int(st.session_state.get("mcap_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("price_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("div_filter_mode", "Any") != "Any"),
-            int(relative_value_available and st.session_state.get("relvol_filter_mode", "Any") != "Any"),
-            int(momentum_available and st.session_state.get("momentum_filter_mode", "Any") != "Any"),
-            int(avg_value_available and st.session_state.get("value_filter_mode", "Any") != "Any"),
-            int(bool(st.session_state.get("apply_pbr_max", False))),
-            int(bool(st.session_state.get("apply_reserve_ratio_min", False))),
-            int(bool(st.session_state.get("apply_roe_min", False))),
-            int(bool(st.session_state.get("apply_eps_positive", False))),
-            int(fundamental_metric_availability["ev_ebitda"] and st.session_state.get("ev_ebitda_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("rsi_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("dist_sma20_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("dist_sma50_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("dist_sma200_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("near_high_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("near_low_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("atr_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("gap_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("chg_open_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("volatility_filter_mode", "Any") != "Any"),
-            int(st.session_state.get("foreign_buy_filter_mode", "Any") != "Any"),
-            int(bool(st.session_state.get("apply_eps_cagr_5y", False))),
-            int(bool(st.session_state.get("apply_eps_yoy_q", False))),
-            int(bool(st.session_state.get("apply_eps_qoq", False))),
-            int(bool(st.session_state.get("apply_sales_growth_qoq", False))),
-            int(bool(st.session_state.get("apply_sales_growth_ttm", False))),
-            int(bool(st.session_state.get("apply_sales_cagr_5y", False))),
-            int(bool(st.session_state.get("apply_has_price_5y", False))),
-            int(bool(st.session_state.get("apply_has_price_10y", False))),
-        ]
-    )
-
-header_cols = st.columns([4, 1])
-with header_cols[0]:
-    st.caption(f"Active filters: {_active_filter_count_from_state()}개")
-with header_cols[1]:
-    if st.button("초기화", key="reset_all_filters"):
-        _reset_all_filters()
-        _safe_rerun()
-
-descriptive_tab, fundamental_tab, technical_tab, backtest_tab = st.tabs(["Descriptive", "Fundamental", "Technical", "Backtest"])
-
-with descriptive_tab:
-    st.markdown("#### 시장")
-    mkt_cols = st.columns(4)
-    with mkt_cols[0]:
-        ticker_input = st.text_input("티커", help="콤마(,) 또는 공백으로 여러 티커를 입력하세요.", key="ticker_input")
-    with mkt_cols[1]:
-        mkt = st.multiselect("시장", sorted(base["market"].dropna().unique().tolist()), key="mkt")
-
-    raw_tickers = [token.strip().upper() for token in re.split(r"[\s,]+", ticker_input or "") if token.strip()]
-    ticker_list = list(dict.fromkeys(raw_tickers))
-
-    mcap_filter_mode, mcap_bucket, mcap_min_custom, mcap_max_custom = _render_descriptive_range_filter(
-        title="시가총액",
-        mode_key="mcap_filter_mode",
-        mode_options=MCAP_MODES,
-        bucket_key="mcap_bucket",
-        bucket_options=MCAP_BUCKETS,
-        min_key="mcap_min_custom",
-        max_key="mcap_max_custom",
-        step=100_000_000.0,
-        unit_help="단위: 원",
-    )
-
-    price_filter_mode, price_bucket, price_min_custom, price_max_custom = _render_descriptive_range_filter(
-        title="가격",
-        mode_key="price_filter_mode",
-        mode_options=PRICE_MODES,
-        bucket_key="price_bucket",
-        bucket_options=PRICE_BUCKETS,
-        min_key="price_min_custom",
-        max_key="price_max_custom",
-        step=100.0,
-        unit_help="단위: 원",
+@_fragment
+def _render_screen(base: pd.DataFrame, snapshot_meta: dict[str, Any], asof: str) -> None:
+    st.markdown("### 조건 선택")
+    st.caption("조건은 Any + 임계치 방식으로 설정되며, 계산 불가한 항목은 자동 비활성화됩니다.")
+
+    avg_value_available = snapshot_meta["avg_value_available"]
+    relative_value_available = snapshot_meta["relative_value_available"]
+    available_momentum_metrics = snapshot_meta["available_momentum_metrics"]
+    momentum_available = bool(available_momentum_metrics)
+    fundamental_metric_availability = snapshot_meta["fundamental_metric_availability"]
+    technical_metric_availability = snapshot_meta["technical_metric_availability"]
+
+    # Availability-gated mode filters only count when their metric has data in this snapshot.
+    gated_count_mode_keys = tuple(
+        key
+        for available, key in (
+            (relative_value_available, "relvol_filter_mode"),
+            (momentum_available, "momentum_filter_mode"),
+            (avg_value_available, "value_filter_mode"),
+            (fundamental_metric_availability["ev_ebitda"], "ev_ebitda_filter_mode"),
+        )
+        if available
     )
 
-    div_filter_mode, div_bucket, div_min_custom, div_max_custom = _render_descriptive_range_filter(
-        title="배당",
-        mode_key="div_filter_mode",
-        mode_options=DIV_MODES,
-        bucket_key="div_bucket",
-        bucket_options=DIV_BUCKETS,
-        min_key="div_min_custom",
-        max_key="div_max_custom",
-        step=0.1,
-        unit_help="단위: %",
-    )
+    def _active_filter_count_from_state() -> int:
+        state = st.session_state
+        # One bit per active filter, folded into a single int and counted with bit_count().
+        flags = int(any(_TICKER_SPLIT_RE.split(state.get("ticker_input", "") or "")))
+        flags = (flags << 1) | bool(state.get("mkt", []))
+        for key in ACTIVE_COUNT_MODE_KEYS + gated_count_mode_keys:
+            flags = (flags << 1) | (state.get(key, "Any") != "Any")
+        for key in ACTIVE_COUNT_APPLY_KEYS:
+            flags = (flags << 1) | bool(state.get(key, False))
+        return flags.bit_count()
+
+    header_cols = st.columns([4, 1])
+    with header_cols[0]:
+        st.caption(f"Active filters: {_active_filter_count_from_state()}개")
+    with header_cols[1]:
+        if st.button("초기화", key="reset_all_filters"):
+            _reset_all_filters()
+            _safe_rerun()
 
-    if not avg_value_available:
-        st.session_state.value_filter_mode = "Any"
-    value_filter_mode, value_bucket, value_min_custom, value_max_custom = _render_descriptive_range_filter(
-        title="평균 거래대금",
-        mode_key="value_filter_mode",
-        mode_options=VALUE_MODES,
-        bucket_key="value_bucket",
-        bucket_options=VALUE_BUCKETS,
-        min_key="value_min_custom",
-        max_key="value_max_custom",
-        step=100_000_000.0,
-        unit_help="단위: 원",
-        mode_help="avg_value_20d = 최근 20거래일 일평균 거래대금",
-        row_disabled=not avg_value_available,
-    )
-    if not avg_value_available:
-        st.info("평균 거래대금 데이터가 없어 해당 필터를 비활성화했습니다.")
-    _render_descriptive_caption(
-        _format_volume_caption("평균 거래대금", value_filter_mode, value_bucket, value_min_custom, value_max_custom, "원")
-    )
+    descriptive_tab, fundamental_tab, technical_tab, backtest_tab = st.tabs(["Descriptive", "Fundamental", "Technical", "Backtest"])
+
+    with descriptive_tab:
+        st.markdown("#### 시장")
+        mkt_cols = st.columns(4)
+        with mkt_cols[0]:
+            ticker_input = st.text_input("티커", help="콤마(,) 또는 공백으로 여러 티커를 입력하세요.", key="ticker_input")
+        with mkt_cols[1]:
+            mkt = st.multiselect("시장", snapshot_meta["markets"], key="mkt")
+
+        # The split already consumes whitespace, so only the empty edge tokens need dropping.
+        ticker_list = list(dict.fromkeys(token.upper() for token in _TICKER_SPLIT_RE.split(ticker_input or "") if token))
+
+        mcap_filter_mode, mcap_bucket, mcap_min_custom, mcap_max_custom = _render_descriptive_range_filter(
+            title="시가총액",
+            mode_key="mcap_filter_mode",
+            mode_options=MCAP_MODES,
+            bucket_key="mcap_bucket",
+            bucket_options=MCAP_BUCKETS,
+            min_key="mcap_min_custom",
+            max_key="mcap_max_custom",
+            step=100_000_000.0,
+            unit_help="단위: 원",
+        )
 
-    if not relative_value_available:
-        st.session_state.relvol_filter_mode = "Any"
-    relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom = _render_descriptive_range_filter(
-        title="상대거래량",
-        mode_key="relvol_filter_mode",
-        mode_options=RELVOL_MODES,
-        bucket_key="relvol_bucket",
-        bucket_options=RELVOL_BUCKETS,
-        min_key="relvol_min_custom",
-        max_key="relvol_max_custom",
-        step=0.1,
-        unit_help="단위: x",
-        mode_help="상대거래량 = current_value / avg_value_20d",
-        row_disabled=not relative_value_available,
-    )
-    if not relative_value_available:
-        st.info("relative_value 데이터가 없어 해당 필터를 비활성화했습니다.")
-    _render_descriptive_caption(
-        _format_volume_caption("상대거래량", relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom, "x")
-    )
+        price_filter_mode, price_bucket, price_min_custom, price_max_custom = _render_descriptive_range_filter(
+            title="가격",
+            mode_key="price_filter_mode",
+            mode_options=PRICE_MODES,
+            bucket_key="price_bucket",
+            bucket_options=PRICE_BUCKETS,
+            min_key="price_min_custom",
+            max_key="price_max_custom",
+            step=100.0,
+            unit_help="단위: 원",
+        )
 
-    if not momentum_available:
-        st.session_state.momentum_filter_mode = "Any"
-    momentum_metric, momentum_filter_mode, momentum_bucket, momentum_min_custom, momentum_max_custom = _render_momentum_filter(
-        row_disabled=not momentum_available
-    )
-    if momentum_metric not in available_momentum_metrics and available_momentum_metrics:
-        st.session_state.momentum_metric = available_momentum_metrics[0]
-        momentum_metric = st.session_state.momentum_metric
-    if not momentum_available:
-        st.info("모멘텀 데이터가 없어 해당 필터를 비활성화했습니다.")
-
-with fundamental_tab:
-    st.caption("Finviz 스타일로 자주 쓰는 Fundamental 조건을 같은 그리드에 배치했습니다.")
-
-    top_cols = st.columns(4)
-    with top_cols[0]:
-        apply_pbr_max = st.checkbox("최대 PBR 적용", key="apply_pbr_max")
-        pbr_max = st.number_input("최대 PBR", min_value=0.0, step=0.1, disabled=not apply_pbr_max, key="pbr_max")
-    with top_cols[1]:
-        apply_roe_min = st.checkbox("최소 ROE proxy 적용", key="apply_roe_min")
-        roe_min = st.number_input("최소 ROE proxy", step=0.01, disabled=not apply_roe_min, key="roe_min")
-    with top_cols[2]:
-        apply_reserve_ratio_min = st.checkbox("최소 유보율(%) 적용", key="apply_reserve_ratio_min")
-        reserve_ratio_min = st.number_input(
-            "최소 유보율(%)", step=50.0, disabled=not apply_reserve_ratio_min, key="reserve_ratio_min"
+        div_filter_mode, div_bucket, div_min_custom, div_max_custom = _render_descriptive_range_filter(
+            title="배당",
+            mode_key="div_filter_mode",
+            mode_options=DIV_MODES,
+            bucket_key="div_bucket",
+            bucket_options=DIV_BUCKETS,
+            min_key="div_min_custom",
+            max_key="div_max_custom",
+            step=0.1,
+            unit_help="단위: %",
         )
-    with top_cols[3]:
-        apply_eps_positive = st.checkbox("EPS 흑자 기업만(적자 제외)", key="apply_eps_positive")
-
-    if not fundamental_metric_availability["ev_ebitda"]:
-        st.session_state.ev_ebitda_filter_mode = "Any"
-    ev_ebitda_filter_mode, ev_ebitda_bucket, ev_ebitda_min_custom, ev_ebitda_max_custom = _render_descriptive_range_filter(
-        title="EV/EBITDA",
-        mode_key="ev_ebitda_filter_mode",
-        mode_options=EV_EBITDA_MODES,
-        bucket_key="ev_ebitda_bucket",
-        bucket_options=EV_EBITDA_BUCKETS,
-        min_key="ev_ebitda_min_custom",
-        max_key="ev_ebitda_max_custom",
-        step=0.5,
-        unit_help="단위: x",
-        mode_help="ev_ebitda가 결측인 경우 필터를 Any로 강제합니다.",
-        row_disabled=not fundamental_metric_availability["ev_ebitda"],
-    )
-    if not fundamental_metric_availability["ev_ebitda"]:
-        st.info("EV/EBITDA 데이터 결측 비중이 높아 해당 필터를 Any로 전환했습니다.")
-
-    if not fundamental_metric_availability["eps_cagr_5y"]:
-        st.session_state.apply_eps_cagr_5y = False
-    if not fundamental_metric_availability["eps_yoy_q"]:
-        st.session_state.apply_eps_yoy_q = False
-    if not fundamental_metric_availability["eps_qoq"]:
-        st.session_state.apply_eps_qoq = False
-    if not fundamental_metric_availability["sales_growth_qoq"]:
-        st.session_state.apply_sales_growth_qoq = False
-    if not fundamental_metric_availability["sales_growth_ttm"]:
-        st.session_state.apply_sales_growth_ttm = False
-    if not fundamental_metric_availability["sales_cagr_5y"]:
-        st.session_state.apply_sales_cagr_5y = False
-
-    growth_cols = st.columns(3)
-    with growth_cols[0]:
-        apply_eps_cagr_5y = st.checkbox(
-            "최근 5년 EPS CAGR 조건 적용",
-            key="apply_eps_cagr_5y",
-            disabled=not fundamental_metric_availability["eps_cagr_5y"],
+
+        if not avg_value_available:
+            st.session_state.value_filter_mode = "Any"
+        value_filter_mode, value_bucket, value_min_custom, value_max_custom = _render_descriptive_range_filter(
+            title="평균 거래대금",
+            mode_key="value_filter_mode",
+            mode_options=VALUE_MODES,
+            bucket_key="value_bucket",
+            bucket_options=VALUE_BUCKETS,
+            min_key="value_min_custom",
+            max_key="value_max_custom",
+            step=100_000_000.0,
+            unit_help="단위: 원",
+            mode_help="avg_value_20d = 최근 20거래일 일평균 거래대금",
+            row_disabled=not avg_value_available,
         )
-        eps_cagr_5y_min = st.number_input(
-            "최근 5년 EPS CAGR 최소",
-            step=0.01,
-            format="%.2f",
-            disabled=not apply_eps_cagr_5y,
-            key="eps_cagr_5y_min",
+        if not avg_value_available:
+            st.info("평균 거래대금 데이터가 없어 해당 필터를 비활성화했습니다.")
+        _render_descriptive_caption(
+            _format_volume_caption("평균 거래대금", value_filter_mode, value_bucket, value_min_custom, value_max_custom, "원")
         )
 
-        apply_sales_growth_qoq = st.checkbox(
-            "최근 분기 Sales Q/Q 조건 적용",
-            key="apply_sales_growth_qoq",
-            disabled=not fundamental_metric_availability["sales_growth_qoq"],
+        if not relative_value_available:
+            st.session_state.relvol_filter_mode = "Any"
+        relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom = _render_descriptive_range_filter(
+            title="상대거래량",
+            mode_key="relvol_filter_mode",
+            mode_options=RELVOL_MODES,
+            bucket_key="relvol_bucket",
+            bucket_options=RELVOL_BUCKETS,
+            min_key="relvol_min_custom",
+            max_key="relvol_max_custom",
+            step=0.1,
+            unit_help="단위: x",
+            mode_help="상대거래량 = current_value / avg_value_20d",
+            row_disabled=not relative_value_available,
         )
-        sales_growth_qoq_min = st.number_input(
-            "최근 분기 Sales Q/Q 최소",
-            step=0.01,
-            format="%.2f",
-            disabled=not apply_sales_growth_qoq,
-            key="sales_growth_qoq_min",
+        if not relative_value_available:
+            st.info("relative_value 데이터가 없어 해당 필터를 비활성화했습니다.")
+        _render_descriptive_caption(
+            _format_volume_caption("상대거래량", relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom, "x")
         )
 
-    with growth_cols[1]:
-        apply_eps_yoy_q = st.checkbox(
-            "최근 분기 EPS YoY 조건 적용(호환키)",
-            key="apply_eps_yoy_q",
-            disabled=not fundamental_metric_availability["eps_yoy_q"],
-            help="기존 query/session 키 호환을 위해 유지되며, 값은 분기 EPS 성장률(Q/Q)과 동일하게 계산됩니다.",
+        if not momentum_available:
+            st.session_state.momentum_filter_mode = "Any"
+        momentum_metric, momentum_filter_mode, momentum_bucket, momentum_min_custom, momentum_max_custom = _render_momentum_filter(
+            row_disabled=not momentum_available
         )
-        eps_yoy_q_min = st.number_input(
-            "최근 분기 EPS YoY 최소",
-            step=0.01,
-            format="%.2f",
-            disabled=not apply_eps_yoy_q,
-            key="eps_yoy_q_min",
+        if momentum_metric not in available_momentum_metrics and available_momentum_metrics:
+            st.session_state.momentum_metric = available_momentum_metrics[0]
+            momentum_metric = st.session_state.momentum_metric
+        if not momentum_available:
+            st.info("모멘텀 데이터가 없어 해당 필터를 비활성화했습니다.")
+
+    with fundamental_tab:
+        st.caption("Finviz 스타일로 자주 쓰는 Fundamental 조건을 같은 그리드에 배치했습니다.")
+
+        top_cols = st.columns(4)
+        with top_cols[0]:
+            apply_pbr_max = st.checkbox("최대 PBR 적용", key="apply_pbr_max")
+            st.number_input("최대 PBR", min_value=0.0, step=0.1, disabled=not apply_pbr_max, key="pbr_max")
+        with top_cols[1]:
+            apply_roe_min = st.checkbox("최소 ROE proxy 적용", key="apply_roe_min")
+            st.number_input("최소 ROE proxy", step=0.01, disabled=not apply_roe_min, key="roe_min")
+        with top_cols[2]:
+            apply_reserve_ratio_min = st.checkbox("최소 유보율(%) 적용", key="apply_reserve_ratio_min")
+            st.number_input(
+                "최소 유보율(%)", step=50.0, disabled=not apply_reserve_ratio_min, key="reserve_ratio_min"
+            )
+        with top_cols[3]:
+            apply_eps_positive = st.checkbox("EPS 흑자 기업만(적자 제외)", key="apply_eps_positive")
+
+        if not fundamental_metric_availability["ev_ebitda"]:
+            st.session_state.ev_ebitda_filter_mode = "Any"
+        ev_ebitda_filter_mode, ev_ebitda_bucket, ev_ebitda_min_custom, ev_ebitda_max_custom = _render_descriptive_range_filter(
+            title="EV/EBITDA",
+            mode_key="ev_ebitda_filter_mode",
+            mode_options=EV_EBITDA_MODES,
+            bucket_key="ev_ebitda_bucket",
+            bucket_options=EV_EBITDA_BUCKETS,
+            min_key="ev_ebitda_min_custom",
+            max_key="ev_ebitda_max_custom",
+            step=0.5,
+            unit_help="단위: x",
+            mode_help="ev_ebitda가 결측인 경우 필터를 Any로 강제합니다.",
+            row_disabled=not fundamental_metric_availability["ev_ebitda"],
         )
+        if not fundamental_metric_availability["ev_ebitda"]:
+            st.info("EV/EBITDA 데이터 결측 비중이 높아 해당 필터를 Any로 전환했습니다.")
+
+        if not fundamental_metric_availability["eps_cagr_5y"]:
+            st.session_state.apply_eps_cagr_5y = False
+        if not fundamental_metric_availability["eps_yoy_q"]:
+            st.session_state.apply_eps_yoy_q = False
+        if not fundamental_metric_availability["eps_qoq"]:
+            st.session_state.apply_eps_qoq = False
+        if not fundamental_metric_availability["sales_growth_qoq"]:
+            st.session_state.apply_sales_growth_qoq = False
+        if not fundamental_metric_availability["sales_growth_ttm"]:
+            st.session_state.apply_sales_growth_ttm = False
+        if not fundamental_metric_availability["sales_cagr_5y"]:
+            st.session_state.apply_sales_cagr_5y = False
+
+        growth_cols = st.columns(3)
+        with growth_cols[0]:
+            apply_eps_cagr_5y = st.checkbox(
+                "최근 5년 EPS CAGR 조건 적용",
+                key="apply_eps_cagr_5y",
+                disabled=not fundamental_metric_availability["eps_cagr_5y"],
+            )
+            st.number_input(
+                "최근 5년 EPS CAGR 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_eps_cagr_5y,
+                key="eps_cagr_5y_min",
+            )
+
+            apply_sales_growth_qoq = st.checkbox(
+                "최근 분기 Sales Q/Q 조건 적용",
+                key="apply_sales_growth_qoq",
+                disabled=not fundamental_metric_availability["sales_growth_qoq"],
+            )
+            st.number_input(
+                "최근 분기 Sales Q/Q 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_sales_growth_qoq,
+                key="sales_growth_qoq_min",
+            )
+
+        with growth_cols[1]:
+            apply_eps_yoy_q = st.checkbox(
+                "최근 분기 EPS YoY 조건 적용(호환키)",
+                key="apply_eps_yoy_q",
+                disabled=not fundamental_metric_availability["eps_yoy_q"],
+                help="기존 query/session 키 호환을 위해 유지되며, 값은 분기 EPS 성장률(Q/Q)과 동일하게 계산됩니다.",
+            )
+            st.number_input(
+                "최근 분기 EPS YoY 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_eps_yoy_q,
+                key="eps_yoy_q_min",
+            )
+
+            apply_sales_growth_ttm = st.checkbox(
+                "Sales TTM 성장률 조건 적용",
+                key="apply_sales_growth_ttm",
+                disabled=not fundamental_metric_availability["sales_growth_ttm"],
+            )
+            st.number_input(
+                "Sales TTM 성장률 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_sales_growth_ttm,
+                key="sales_growth_ttm_min",
+            )
+
+        with growth_cols[2]:
+            apply_eps_qoq = st.checkbox(
+                "최근 분기 EPS Q/Q 조건 적용",
+                key="apply_eps_qoq",
+                disabled=not fundamental_metric_availability["eps_qoq"],
+            )
+            st.number_input(
+                "최근 분기 EPS Q/Q 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_eps_qoq,
+                key="eps_qoq_min",
+            )
+
+            apply_sales_cagr_5y = st.checkbox(
+                "최근 5년 Sales CAGR 조건 적용",
+                key="apply_sales_cagr_5y",
+                disabled=not fundamental_metric_availability["sales_cagr_5y"],
+            )
+            st.number_input(
+                "최근 5년 Sales CAGR 최소",
+                step=0.01,
+                format="%.2f",
+                disabled=not apply_sales_cagr_5y,
+                key="sales_cagr_5y_min",
+            )
 
-        apply_sales_growth_ttm = st.checkbox(
-            "Sales TTM 성장률 조건 적용",
-            key="apply_sales_growth_ttm",
-            disabled=not fundamental_metric_availability["sales_growth_ttm"],
+        coverage_cols = st.columns(2)
+        with coverage_cols[0]:
+            apply_has_price_5y = st.checkbox("가격 데이터 5Y 커버리지 종목만", key="apply_has_price_5y")
+        with coverage_cols[1]:
+            apply_has_price_10y = st.checkbox("가격 데이터 10Y 커버리지 종목만", key="apply_has_price_10y")
+
+    with technical_tab:
+        if not technical_metric_availability["rsi_14"]:
+            st.session_state.rsi_filter_mode = "Any"
+        _render_technical_range_filter(
+            title="RSI(14)",
+            mode_key="rsi_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="rsi_bucket",
+            bucket_options=RSI_BUCKETS,
+            min_key="rsi_min_custom",
+            max_key="rsi_max_custom",
+            step=0.1,
+            number_format="%.2f",
+            min_value=0.0,
+            help_text="rsi_14 데이터가 없으면 비활성화됩니다.",
+            row_disabled=not technical_metric_availability["rsi_14"],
         )
-        sales_growth_ttm_min = st.number_input(
-            "Sales TTM 성장률 최소",
+
+        _render_technical_range_filter(
+            title="20일 이동평균선 대비 위치(dist_sma20)",
+            mode_key="dist_sma20_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="dist_sma20_bucket",
+            bucket_options=DIST_SMA_BUCKETS,
+            min_key="dist_sma20_min_custom",
+            max_key="dist_sma20_max_custom",
             step=0.01,
-            format="%.2f",
-            disabled=not apply_sales_growth_ttm,
-            key="sales_growth_ttm_min",
+            number_format="%.2f",
+            help_text="비율(예: 0.05=+5%)",
+            row_disabled=not technical_metric_availability["dist_sma20"],
         )
 
-    with growth_cols[2]:
-        apply_eps_qoq = st.checkbox(
-            "최근 분기 EPS Q/Q 조건 적용",
-            key="apply_eps_qoq",
-            disabled=not fundamental_metric_availability["eps_qoq"],
-        )
-        eps_qoq_min = st.number_input(
-            "최근 분기 EPS Q/Q 최소",
+        _render_technical_range_filter(
+            title="50일 이동평균선 대비 위치(dist_sma50)",
+            mode_key="dist_sma50_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="dist_sma50_bucket",
+            bucket_options=DIST_SMA_BUCKETS,
+            min_key="dist_sma50_min_custom",
+            max_key="dist_sma50_max_custom",
             step=0.01,
-            format="%.2f",
-            disabled=not apply_eps_qoq,
-            key="eps_qoq_min",
+            number_format="%.2f",
+            help_text="비율(예: 0.05=+5%)",
+            row_disabled=not technical_metric_availability["dist_sma50"],
         )
 
-        apply_sales_cagr_5y = st.checkbox(
-            "최근 5년 Sales CAGR 조건 적용",
-            key="apply_sales_cagr_5y",
-            disabled=not fundamental_metric_availability["sales_cagr_5y"],
-        )
-        sales_cagr_5y_min = st.number_input(
-            "최근 5년 Sales CAGR 최소",
+        _render_technical_range_filter(
+            title="200일 이동평균선 대비 위치(dist_sma200)",
+            mode_key="dist_sma200_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="dist_sma200_bucket",
+            bucket_options=DIST_SMA_BUCKETS,
+            min_key="dist_sma200_min_custom",
+            max_key="dist_sma200_max_custom",
             step=0.01,
-            format="%.2f",
-            disabled=not apply_sales_cagr_5y,
-            key="sales_cagr_5y_min",
+            number_format="%.2f",
+            help_text="비율(예: 0.05=+5%)",
+            row_disabled=not technical_metric_availability["dist_sma200"],
         )
 
-    coverage_cols = st.columns(2)
-    with coverage_cols[0]:
-        apply_has_price_5y = st.checkbox("가격 데이터 5Y 커버리지 종목만", key="apply_has_price_5y")
-    with coverage_cols[1]:
-        apply_has_price_10y = st.checkbox("가격 데이터 10Y 커버리지 종목만", key="apply_has_price_10y")
-
-with technical_tab:
-    if not technical_metric_availability["rsi_14"]:
-        st.session_state.rsi_filter_mode = "Any"
-    _render_technical_range_filter(
-        title="RSI(14)",
-        mode_key="rsi_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="rsi_bucket",
-        bucket_options=RSI_BUCKETS,
-        min_key="rsi_min_custom",
-        max_key="rsi_max_custom",
-        step=0.1,
-        number_format="%.2f",
-        min_value=0.0,
-        help_text="rsi_14 데이터가 없으면 비활성화됩니다.",
-        row_disabled=not technical_metric_availability["rsi_14"],
-    )
-
-    _render_technical_range_filter(
-        title="20일 이동평균선 대비 위치(dist_sma20)",
-        mode_key="dist_sma20_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="dist_sma20_bucket",
-        bucket_options=DIST_SMA_BUCKETS,
-        min_key="dist_sma20_min_custom",
-        max_key="dist_sma20_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        help_text="비율(예: 0.05=+5%)",
-        row_disabled=not technical_metric_availability["dist_sma20"],
-    )
-
-    _render_technical_range_filter(
-        title="50일 이동평균선 대비 위치(dist_sma50)",
-        mode_key="dist_sma50_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="dist_sma50_bucket",
-        bucket_options=DIST_SMA_BUCKETS,
-        min_key="dist_sma50_min_custom",
-        max_key="dist_sma50_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        help_text="비율(예: 0.05=+5%)",
-        row_disabled=not technical_metric_availability["dist_sma50"],
-    )
-
-    _render_technical_range_filter(
-        title="200일 이동평균선 대비 위치(dist_sma200)",
-        mode_key="dist_sma200_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="dist_sma200_bucket",
-        bucket_options=DIST_SMA_BUCKETS,
-        min_key="dist_sma200_min_custom",
-        max_key="dist_sma200_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        help_text="비율(예: 0.05=+5%)",
-        row_disabled=not technical_metric_availability["dist_sma200"],
-    )
+        _render_technical_range_filter(
+            title="52주 High 근접도(near_52w_high_ratio)",
+            mode_key="near_high_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="near_high_bucket",
+            bucket_options=NEAR_HIGH_BUCKETS,
+            min_key="near_high_min_custom",
+            max_key="near_high_max_custom",
+            step=0.01,
+            number_format="%.2f",
+            min_value=0.0,
+            help_text="현재가/52주고가 비율",
+            row_disabled=not technical_metric_availability["near_52w_high_ratio"],
+        )
 
-    _render_technical_range_filter(
-        title="52주 High 근접도(near_52w_high_ratio)",
-        mode_key="near_high_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="near_high_bucket",
-        bucket_options=NEAR_HIGH_BUCKETS,
-        min_key="near_high_min_custom",
-        max_key="near_high_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        min_value=0.0,
-        help_text="현재가/52주고가 비율",
-        row_disabled=not technical_metric_availability["near_52w_high_ratio"],
-    )
+        _render_technical_range_filter(
+            title="52주 Low 근접도(pos_52w)",
+            mode_key="near_low_filter_mode",
+            mode_options=RSI_MODES,
+            bucket_key="near_low_bucket",
+            bucket_options=NEAR_LOW_BUCKETS,
+            min_key="near_low_min_custom",
+            max_key="near_low_max_custom",
+            step=0.01,
+            number_format="%.2f",
+            min_value=0.0,
+            help_text="(현재가-52주저가)/(52주고가-52주저가)",
+            row_disabled=not technical_metric_availability["pos_52w"],
+        )
 
-    _render_technical_range_filter(
-        title="52주 Low 근접도(pos_52w)",
-        mode_key="near_low_filter_mode",
-        mode_options=RSI_MODES,
-        bucket_key="near_low_bucket",
-        bucket_options=NEAR_LOW_BUCKETS,
-        min_key="near_low_min_custom",
-        max_key="near_low_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        min_value=0.0,
-        help_text="(현재가-52주저가)/(52주고가-52주저가)",
-        row_disabled=not technical_metric_availability["pos_52w"],
-    )
+        _render_technical_range_filter(
+            title="ATR(14)",
+            mode_key="atr_filter_mode",
+            mode_options=ATR_MODES,
+            bucket_key="atr_bucket",
+            bucket_options=ATR_BUCKETS,
+            min_key="atr_min_custom",
+            max_key="atr_max_custom",
+            step=0.1,
+            number_format="%.2f",
+            min_value=0.0,
+            help_text="atr_14 값",
+            row_disabled=not technical_metric_availability["atr_14"],
+        )
 
-    _render_technical_range_filter(
-        title="ATR(14)",
-        mode_key="atr_filter_mode",
-        mode_options=ATR_MODES,
-        bucket_key="atr_bucket",
-        bucket_options=ATR_BUCKETS,
-        min_key="atr_min_custom",
-        max_key="atr_max_custom",
-        step=0.1,
-        number_format="%.2f",
-        min_value=0.0,
-        help_text="atr_14 값",
-        row_disabled=not technical_metric_availability["atr_14"],
-    )
+        _render_technical_range_filter(
+            title="Gap%(gap_pct)",
+            mode_key="gap_filter_mode",
+            mode_options=GAP_MODES,
+            bucket_key="gap_bucket",
+            bucket_options=GAP_BUCKETS,
+            min_key="gap_min_custom",
+            max_key="gap_max_custom",
+            step=0.01,
+            number_format="%.2f",
+            help_text="비율(예: 0.02=+2%)",
+            row_disabled=not technical_metric_availability["gap_pct"],
+        )
 
-    _render_technical_range_filter(
-        title="Gap%(gap_pct)",
-        mode_key="gap_filter_mode",
-        mode_options=GAP_MODES,
-        bucket_key="gap_bucket",
-        bucket_options=GAP_BUCKETS,
-        min_key="gap_min_custom",
-        max_key="gap_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        help_text="비율(예: 0.02=+2%)",
-        row_disabled=not technical_metric_availability["gap_pct"],
-    )
+        _render_technical_range_filter(
+            title="시가대비 등락률(chg_from_open_pct)",
+            mode_key="chg_open_filter_mode",
+            mode_options=CHG_OPEN_MODES,
+            bucket_key="chg_open_bucket",
+            bucket_options=CHG_OPEN_BUCKETS,
+            min_key="chg_open_min_custom",
+            max_key="chg_open_max_custom",
+            step=0.01,
+            number_format="%.2f",
+            help_text="비율(예: 0.03=+3%)",
+            row_disabled=not technical_metric_availability["chg_from_open_pct"],
+        )
 
-    _render_technical_range_filter(
-        title="시가대비 등락률(chg_from_open_pct)",
-        mode_key="chg_open_filter_mode",
-        mode_options=CHG_OPEN_MODES,
-        bucket_key="chg_open_bucket",
-        bucket_options=CHG_OPEN_BUCKETS,
-        min_key="chg_open_min_custom",
-        max_key="chg_open_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        help_text="비율(예: 0.03=+3%)",
-        row_disabled=not technical_metric_availability["chg_from_open_pct"],
-    )
+        st.markdown("##### 변동성")
+        _render_technical_range_filter(
+            title="변동성(20D)",
+            mode_key="volatility_filter_mode",
+            mode_options=VOLATILITY_MODES,
+            bucket_key="volatility_bucket",
+            bucket_options=VOLATILITY_BUCKETS,
+            min_key="volatility_min_custom",
+            max_key="volatility_max_custom",
+            step=0.01,
+            number_format="%.2f",
+            min_value=0.0,
+            help_text="volatility_20d 비율",
+            row_disabled=not technical_metric_availability["volatility_20d"],
+        )
 
-    st.markdown("##### 변동성")
-    _render_technical_range_filter(
-        title="변동성(20D)",
-        mode_key="volatility_filter_mode",
-        mode_options=VOLATILITY_MODES,
-        bucket_key="volatility_bucket",
-        bucket_options=VOLATILITY_BUCKETS,
-        min_key="volatility_min_custom",
-        max_key="volatility_max_custom",
-        step=0.01,
-        number_format="%.2f",
-        min_value=0.0,
-        help_text="volatility_20d 비율",
-        row_disabled=not technical_metric_availability["volatility_20d"],
-    )
+        st.markdown("##### 외국인")
+        foreign_buy_window_label = st.selectbox(
+            "외국인 누적 윈도우",
+            list(FOREIGN_BUY_WINDOW_OPTIONS.keys()),
+            index=0 if int(st.session_state.get("foreign_buy_window", 20)) == 20 else 1,
+            format_func=lambda label: f"{label} 누적",
+            key="foreign_buy_window_label",
+        )
+        st.session_state.foreign_buy_window = FOREIGN_BUY_WINDOW_OPTIONS[foreign_buy_window_label]
+        foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+        st.session_state.foreign_buy_metric = foreign_buy_metric
+        foreign_buy_metric_name, foreign_buy_metric_unit = FOREIGN_BUY_METRICS[foreign_buy_metric]
+        foreign_buy_metric_config = FOREIGN_BUY_METRIC_CONFIGS[foreign_buy_metric]
+        _render_technical_range_filter(
+            title=foreign_buy_metric_name,
+            mode_key="foreign_buy_filter_mode",
+            mode_options=FOREIGN_BUY_MODES,
+            bucket_key="foreign_buy_bucket",
+            bucket_options=foreign_buy_metric_config["bucket_options"],
+            min_key="foreign_buy_min_custom",
+            max_key="foreign_buy_max_custom",
+            step=foreign_buy_metric_config["step"],
+            number_format=foreign_buy_metric_config["number_format"],
+            help_text=foreign_buy_metric_config["help_text"],
+            row_disabled=not technical_metric_availability.get(foreign_buy_metric, False),
+        )
 
-    st.markdown("##### 외국인")
-    foreign_buy_window_label = st.selectbox(
-        "외국인 누적 윈도우",
-        list(FOREIGN_BUY_WINDOW_OPTIONS.keys()),
-        index=0 if int(st.session_state.get("foreign_buy_window", 20)) == 20 else 1,
-        format_func=lambda label: f"{label} 누적",
-        key="foreign_buy_window_label",
-    )
-    st.session_state.foreign_buy_window = FOREIGN_BUY_WINDOW_OPTIONS[foreign_buy_window_label]
-    foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-    st.session_state.foreign_buy_metric = foreign_buy_metric
-    foreign_buy_metric_name, foreign_buy_metric_unit = FOREIGN_BUY_METRICS[foreign_buy_metric]
-    foreign_buy_metric_config = FOREIGN_BUY_METRIC_CONFIGS[foreign_buy_metric]
-    _render_technical_range_filter(
-        title=foreign_buy_metric_name,
-        mode_key="foreign_buy_filter_mode",
-        mode_options=FOREIGN_BUY_MODES,
-        bucket_key="foreign_buy_bucket",
-        bucket_options=foreign_buy_metric_config["bucket_options"],
-        min_key="foreign_buy_min_custom",
-        max_key="foreign_buy_max_custom",
-        step=foreign_buy_metric_config["step"],
-        number_format=foreign_buy_metric_config["number_format"],
-        help_text=foreign_buy_metric_config["help_text"],
-        row_disabled=not technical_metric_availability.get(foreign_buy_metric, False),
-    )
+        with st.expander("외국인 데이터 진단", expanded=False):
+            foreign_metrics = [
+                "foreign_net_buy_volume",
+                "foreign_net_buy_volume_20d",
+                "foreign_net_buy_volume_60d",
+                "foreign_net_buy_value",
+                "foreign_net_buy_value_20d",
+                "foreign_net_buy_value_60d",
+                "foreign_net_buy_value_20d_mcap_ratio",
+                "foreign_net_buy_value_60d_mcap_ratio",
+            ]
+            total_count = len(base)
+            st.write(f"선택 asof({asof}) 기준 전체 종목 수: **{total_count:,}개**")
+
+            if total_count == 0:
+                st.warning("외국인 진단 대상 데이터가 비어 있습니다. 수집/스냅샷 재생성 필요")
+            else:
+                diag_rows: list[dict[str, Any]] = []
+                for metric in foreign_metrics:
+                    metric_name, metric_unit = FOREIGN_BUY_METRICS.get(metric, (metric, ""))
+                    non_null_count = int(base[metric].notna().sum()) if metric in base.columns else 0
+                    diag_rows.append(
+                        {
+                            "metric": metric,
+                            "label": metric_name,
+                            "unit": metric_unit,
+                            "non_null_count": non_null_count,
+                            "non_null_ratio": non_null_count / total_count,
+                        }
+                    )
 
-    with st.expander("외국인 데이터 진단", expanded=False):
-        foreign_metrics = [
-            "foreign_net_buy_volume",
-            "foreign_net_buy_volume_20d",
-            "foreign_net_buy_volume_60d",
-            "foreign_net_buy_value",
-            "foreign_net_buy_value_20d",
-            "foreign_net_buy_value_60d",
-            "foreign_net_buy_value_20d_mcap_ratio",
-            "foreign_net_buy_value_60d_mcap_ratio",
-        ]
-        total_count = len(base)
-        st.write(f"선택 asof({asof}) 기준 전체 종목 수: **{total_count:,}개**")
-
-        if total_count == 0:
-            st.warning("외국인 진단 대상 데이터가 비어 있습니다. 수집/스냅샷 재생성 필요")
-        else:
-            diag_rows: list[dict[str, Any]] = []
-            for metric in foreign_metrics:
-                metric_name, metric_unit = FOREIGN_BUY_METRICS.get(metric, (metric, ""))
-                non_null_count = int(base[metric].notna().sum()) if metric in base.columns else 0
-                diag_rows.append(
-                    {
-                        "metric": metric,
-                        "label": metric_name,
-                        "unit": metric_unit,
-                        "non_null_count": non_null_count,
-                        "non_null_ratio": non_null_count / total_count,
-                    }
+                st.dataframe(
+                    pd.DataFrame(diag_rows),
+                    width="stretch",
+                    hide_index=True,
+                    column_config={
+                        "metric": "컬럼",
+                        "label": "지표",
+                        "unit": "단위",
+                        "non_null_count": st.column_config.NumberColumn("Non-null 건수", format="%,d"),
+                        "non_null_ratio": st.column_config.NumberColumn("Non-null 비율", format="%.2f%%"),
+                    },
                 )
 
-            st.dataframe(
-                pd.DataFrame(diag_rows),
-                width="stretch",
-                hide_index=True,
-                column_config={
-                    "metric": "컬럼",
-                    "label": "지표",
-                    "unit": "단위",
-                    "non_null_count": st.column_config.NumberColumn("Non-null 건수", format="%,d"),
-                    "non_null_ratio": st.column_config.NumberColumn("Non-null 비율", format="%.2f%%"),
-                },
-            )
-
-            selected_diag_metric = st.session_state.get("foreign_buy_metric", "foreign_net_buy_value_20d")
-            selected_metric_name, _ = FOREIGN_BUY_METRICS.get(
-                selected_diag_metric,
-                FOREIGN_BUY_METRICS["foreign_net_buy_value_20d"],
-            )
-            st.caption(f"선택 metric 예시: {selected_metric_name} ({selected_diag_metric})")
+                selected_diag_metric = st.session_state.get("foreign_buy_metric", "foreign_net_buy_value_20d")
+                selected_metric_name, _ = FOREIGN_BUY_METRICS.get(
+                    selected_diag_metric,
+                    FOREIGN_BUY_METRICS["foreign_net_buy_value_20d"],
+                )
+                st.caption(f"선택 metric 예시: {selected_metric_name} ({selected_diag_metric})")
 
-            if selected_diag_metric not in base.columns:
-                st.warning("선택 metric 컬럼이 snapshot에 없습니다. 수집/스냅샷 재생성 필요")
-            else:
-                metric_non_null = base[base[selected_diag_metric].notna()].copy()
-                if metric_non_null.empty:
-                    st.warning("선택 metric의 값이 비어 있습니다. 수집/스냅샷 재생성 필요")
+                if selected_diag_metric not in base.columns:
+                    st.warning("선택 metric 컬럼이 snapshot에 없습니다. 수집/스냅샷 재생성 필요")
                 else:
-                    metric_examples = [col for col in ["ticker", "name", "market", selected_diag_metric] if col in metric_non_null.columns]
-                    top_examples = metric_non_null.sort_values(selected_diag_metric, ascending=False).head(5)[metric_examples]
-                    bottom_examples = metric_non_null.sort_values(selected_diag_metric, ascending=True).head(5)[metric_examples]
-                    top_col, bottom_col = st.columns(2)
-                    with top_col:
-                        st.markdown("**상위 예시(Top 5)**")
-                        st.dataframe(top_examples, width="stretch", hide_index=True)
-                    with bottom_col:
-                        st.markdown("**하위 예시(Bottom 5)**")
-                        st.dataframe(bottom_examples, width="stretch", hide_index=True)
-
-
-with backtest_tab:
-    st.markdown("#### 외국인 순매수 백테스트")
-    get_trading_dates_fn = getattr(repo, "get_trading_dates", None)
-    if get_trading_dates_fn is None:
-        st.error("현재 실행 중인 Repository에는 get_trading_dates가 없습니다. 최신 코드를 재설치(pip install -e .) 후 다시 실행하세요.")
-    else:
-        trading_dates = get_trading_dates_fn()
-        if len(trading_dates) < 2:
-            st.warning("백테스트를 위한 거래일 데이터가 부족합니다. 먼저 수집을 실행하세요.")
+                    metric_values = base[selected_diag_metric].to_numpy()
+                    non_null_count = int(np.count_nonzero(~np.isnan(metric_values)))
+                    if non_null_count == 0:
+                        st.warning("선택 metric의 값이 비어 있습니다. 수집/스냅샷 재생성 필요")
+                    else:
+                        metric_examples = [col for col in ["ticker", "name", "market", selected_diag_metric] if col in base.columns]
+                        # NaN sorts last, so capping k at the non-null count keeps missing values out.
+                        example_count = min(5, non_null_count)
+                        top_examples = base.iloc[_top_k_positions(metric_values, example_count, ascending=False)][metric_examples]
+                        bottom_examples = base.iloc[_top_k_positions(metric_values, example_count, ascending=True)][metric_examples]
+                        top_col, bottom_col = st.columns(2)
+                        with top_col:
+                            st.markdown("**상위 예시(Top 5)**")
+                            st.dataframe(top_examples, width="stretch", hide_index=True)
+                        with bottom_col:
+                            st.markdown("**하위 예시(Bottom 5)**")
+                            st.dataframe(bottom_examples, width="stretch", hide_index=True)
+
+
+    with backtest_tab:
+        st.markdown("#### 외국인 순매수 백테스트")
+        get_trading_dates_fn = getattr(repo, "get_trading_dates", None)
+        if get_trading_dates_fn is None:
+            st.error("현재 실행 중인 Repository에는 get_trading_dates가 없습니다. 최신 코드를 재설치(pip install -e .) 후 다시 실행하세요.")
         else:
-            end_ts = pd.Timestamp(trading_dates[-1])
-            nine_years_ago = end_ts - pd.DateOffset(years=9)
-            default_start_idx = next((idx for idx, dt in enumerate(trading_dates) if pd.Timestamp(dt) >= nine_years_ago), 0)
-            bt_col1, bt_col2, bt_col3, bt_col4 = st.columns(4)
-            with bt_col1:
-                bt_start = st.selectbox("시작일", trading_dates, index=default_start_idx, key="bt_start")
-            with bt_col2:
-                bt_end = st.selectbox("종료일", trading_dates, index=len(trading_dates) - 1, key="bt_end")
-            with bt_col3:
-                bt_rebalance = st.selectbox("리밸런싱", ["W", "M", "Y"], index=1, key="bt_rebalance")
-            with bt_col4:
-                bt_benchmark_ticker = st.text_input(
-                    "벤치마크(티커 또는 KOSPI)",
-                    value="KOSPI",
-                    key="bt_benchmark_ticker",
-                    help="티커 입력 시 DB 수집 데이터 사용, KOSPI 입력 시 pykrx 지수(1001)를 조회합니다.",
-                )
+            trading_dates = get_trading_dates_fn()
+            if len(trading_dates) < 2:
+                st.warning("백테스트를 위한 거래일 데이터가 부족합니다. 먼저 수집을 실행하세요.")
+            else:
+                end_ts = pd.Timestamp(trading_dates[-1])
+                nine_years_ago = end_ts - pd.DateOffset(years=9)
+                # trading_dates is sorted 'YYYY-MM-DD', so string order matches date order.
+                default_start_idx = bisect.bisect_left(trading_dates, nine_years_ago.strftime("%Y-%m-%d"))
+                if default_start_idx >= len(trading_dates):
+                    default_start_idx = 0
+                bt_col1, bt_col2, bt_col3, bt_col4 = st.columns(4)
+                with bt_col1:
+                    bt_start = st.selectbox("시작일", trading_dates, index=default_start_idx, key="bt_start")
+                with bt_col2:
+                    bt_end = st.selectbox("종료일", trading_dates, index=len(trading_dates) - 1, key="bt_end")
+                with bt_col3:
+                    bt_rebalance = st.selectbox("리밸런싱", ["W", "M", "Y"], index=1, key="bt_rebalance")
+                with bt_col4:
+                    bt_benchmark_ticker = st.text_input(
+                        "벤치마크(티커 또는 KOSPI)",
+                        value="KOSPI",
+                        key="bt_benchmark_ticker",
+                        help="티커 입력 시 DB 수집 데이터 사용, KOSPI 입력 시 pykrx 지수(1001)를 조회합니다.",
+                    )
 
-            fg_col1, fg_col2, fg_col3, fg_col4, fg_col5 = st.columns(5)
-            with fg_col1:
-                bt_foreign_enabled = st.checkbox("외국인 누적금액 필터 사용", value=True, key="bt_foreign_enabled")
-            with fg_col2:
-                bt_foreign_signal_type = st.selectbox(
-                    "외국인 신호 타입",
-                    ["절대금액(기존)", "거래대금 대비", "시총 대비"],
-                    index=0,
-                    key="bt_foreign_signal_type",
-                )
-            with fg_col3:
-                bt_foreign_min_eok = st.number_input(
-                    "외국인 20D 누적금액 최소(억원)",
-                    min_value=0.0,
-                    value=100.0,
-                    step=50.0,
-                    format="%.0f",
-                    key="bt_foreign_min_eok",
-                    help="예: 1000 = 1,000억원 (KRW 100,000,000,000)",
-                )
-            with fg_col4:
-                bt_foreign_window = st.number_input(
-                    "누적 윈도우(거래일)",
-                    min_value=1,
-                    value=20,
-                    step=1,
-                    key="bt_foreign_window",
-                    help="최근 N 거래일의 외국인 순매수 금액을 합산해 필터/정렬 기준으로 사용합니다.",
+                fg_col1, fg_col2, fg_col3, fg_col4, fg_col5 = st.columns(5)
+                with fg_col1:
+                    bt_foreign_enabled = st.checkbox("외국인 누적금액 필터 사용", value=True, key="bt_foreign_enabled")
+                with fg_col2:
+                    bt_foreign_signal_type = st.selectbox(
+                        "외국인 신호 타입",
+                        ["절대금액(기존)", "거래대금 대비", "시총 대비"],
+                        index=0,
+                        key="bt_foreign_signal_type",
+                    )
+                with fg_col3:
+                    bt_foreign_min_eok = st.number_input(
+                        "외국인 20D 누적금액 최소(억원)",
+                        min_value=0.0,
+                        value=100.0,
+                        step=50.0,
+                        format="%.0f",
+                        key="bt_foreign_min_eok",
+                        help="예: 1000 = 1,000억원 (KRW 100,000,000,000)",
+                    )
+                with fg_col4:
+                    bt_foreign_window = st.number_input(
+                        "누적 윈도우(거래일)",
+                        min_value=1,
+                        value=20,
+                        step=1,
+                        key="bt_foreign_window",
+                        help="최근 N 거래일의 외국인 순매수 금액을 합산해 필터/정렬 기준으로 사용합니다.",
+                    )
+                with fg_col5:
+                    bt_cap_n = st.number_input("상위 N (cap_n)", min_value=1, value=20, step=1, key="bt_cap_n")
+
+                tg_col1, tg_col2 = st.columns(2)
+                with tg_col1:
+                    bt_trend_enabled = st.checkbox("추세 필터 사용", value=False, key="bt_trend_enabled")
+                with tg_col2:
+                    st.caption("추세 필터: ret_60d > 0 AND close > sma_200")
+
+                bt_foreign_min_won = float(bt_foreign_min_eok) * 100_000_000.0
+                foreign_signal_options = {
+                    "절대금액(기존)": {"normalize": "none", "sort_by": "foreign_cum_value_20d"},
+                    "거래대금 대비": {"normalize": "by_avg_value", "sort_by": "foreign_pressure_by_avg_value"},
+                    "시총 대비": {"normalize": "by_mcap", "sort_by": "foreign_pressure_by_mcap"},
+                }
+                selected_foreign_signal = foreign_signal_options[bt_foreign_signal_type]
+                st.caption(
+                    f"외국인 최소 기준: {bt_foreign_min_eok:,.0f}억원 (약 {bt_foreign_min_won:,.0f}원) · "
+                    f"누적 윈도우 {int(bt_foreign_window)}거래일 · 신호={bt_foreign_signal_type}"
                 )
-            with fg_col5:
-                bt_cap_n = st.number_input("상위 N (cap_n)", min_value=1, value=20, step=1, key="bt_cap_n")
-
-            tg_col1, tg_col2 = st.columns(2)
-            with tg_col1:
-                bt_trend_enabled = st.checkbox("추세 필터 사용", value=False, key="bt_trend_enabled")
-            with tg_col2:
-                st.caption("추세 필터: ret_60d > 0 AND close > sma_200")
-
-            bt_foreign_min_won = float(bt_foreign_min_eok) * 100_000_000.0
-            foreign_signal_options = {
-                "절대금액(기존)": {"normalize": "none", "sort_by": "foreign_cum_value_20d"},
-                "거래대금 대비": {"normalize": "by_avg_value", "sort_by": "foreign_pressure_by_avg_value"},
-                "시총 대비": {"normalize": "by_mcap", "sort_by": "foreign_pressure_by_mcap"},
-            }
-            selected_foreign_signal = foreign_signal_options[bt_foreign_signal_type]
-            st.caption(
-                f"외국인 최소 기준: {bt_foreign_min_eok:,.0f}억원 (약 {bt_foreign_min_won:,.0f}원) · "
-                f"누적 윈도우 {int(bt_foreign_window)}거래일 · 신호={bt_foreign_signal_type}"
-            )
 
-            uv_col1, uv_col2 = st.columns(2)
-            with uv_col1:
-                bt_min_avg_value_eok = st.number_input(
-                    "유니버스 최소 평균거래대금(20D, 억원)",
-                    min_value=0.0,
-                    value=0.0,
-                    step=50.0,
-                    format="%.0f",
-                    key="bt_min_avg_value_eok",
-                )
-            with uv_col2:
-                bt_min_mcap_eok = st.number_input(
-                    "유니버스 최소 시총(억원)",
-                    min_value=0.0,
-                    value=0.0,
-                    step=500.0,
-                    format="%.0f",
-                    key="bt_min_mcap_eok",
-                )
+                uv_col1, uv_col2 = st.columns(2)
+                with uv_col1:
+                    bt_min_avg_value_eok = st.number_input(
+                        "유니버스 최소 평균거래대금(20D, 억원)",
+                        min_value=0.0,
+                        value=0.0,
+                        step=50.0,
+                        format="%.0f",
+                        key="bt_min_avg_value_eok",
+                    )
+                with uv_col2:
+                    bt_min_mcap_eok = st.number_input(
+                        "유니버스 최소 시총(억원)",
+                        min_value=0.0,
+                        value=0.0,
+                        step=500.0,
+                        format="%.0f",
+                        key="bt_min_mcap_eok",
+                    )
 
-            cs_col1, cs_col2, cs_col3 = st.columns(3)
-            with cs_col1:
-                bt_fee_bps = st.number_input("수수료(bps)", min_value=0.0, value=5.0, step=1.0, key="bt_fee_bps")
-            with cs_col2:
-                bt_slippage_bps = st.number_input("슬리피지(bps)", min_value=0.0, value=5.0, step=1.0, key="bt_slippage_bps")
-            with cs_col3:
-                bt_selection_mode = st.selectbox("선택 방식", ["all", "cap_n"], index=1, key="bt_selection_mode")
+                cs_col1, cs_col2, cs_col3 = st.columns(3)
+                with cs_col1:
+                    bt_fee_bps = st.number_input("수수료(bps)", min_value=0.0, value=5.0, step=1.0, key="bt_fee_bps")
+                with cs_col2:
+                    bt_slippage_bps = st.number_input("슬리피지(bps)", min_value=0.0, value=5.0, step=1.0, key="bt_slippage_bps")
+                with cs_col3:
+                    bt_selection_mode = st.selectbox("선택 방식", ["all", "cap_n"], index=1, key="bt_selection_mode")
 
-            if "backtest_result" not in st.session_state:
-                st.session_state.backtest_result = None
+                if "backtest_result" not in st.session_state:
+                    st.session_state.backtest_result = None
 
-            if st.button("백테스트 실행", key="run_backtest_tab"):
-                if bt_start >= bt_end:
-                    st.error("시작일은 종료일보다 빨라야 합니다.")
-                else:
-                    filters_cfg: dict[str, Any] = {"foreign_window": int(bt_foreign_window)}
-                    if bt_foreign_enabled:
-                        filters_cfg["foreign_cum"] = {
-                            "enabled": True,
-                            "field": "foreign_cum",
-                            "op": "gte",
-                            "value": float(bt_foreign_min_won),
-                            "unit": "value",
-                            "normalize": selected_foreign_signal["normalize"],
-                            "missing_policy": "drop",
-                        }
-                    if bt_trend_enabled:
-                        filters_cfg["ret_60d"] = {
-                            "enabled": True,
-                            "field": "ret_60d",
-                            "op": "gte",
-                            "value": 0.0,
-                            "missing_policy": "drop",
-                        }
-                        filters_cfg["sma_200_gap"] = {
-                            "enabled": True,
-                            "field": "sma_200_gap",
-                            "op": "gte",
-                            "value": 0.0,
-                            "missing_policy": "drop",
+                if st.button("백테스트 실행", key="run_backtest_tab"):
+                    if bt_start >= bt_end:
+                        st.error("시작일은 종료일보다 빨라야 합니다.")
+                    else:
+                        filters_cfg: dict[str, Any] = {"foreign_window": int(bt_foreign_window)}
+                        if bt_foreign_enabled:
+                            filters_cfg["foreign_cum"] = {
+                                "enabled": True,
+                                "field": "foreign_cum",
+                                "op": "gte",
+                                "value": float(bt_foreign_min_won),
+                                "unit": "value",
+                                "normalize": selected_foreign_signal["normalize"],
+                                "missing_policy": "drop",
+                            }
+                        if bt_trend_enabled:
+                            filters_cfg["ret_60d"] = {
+                                "enabled": True,
+                                "field": "ret_60d",
+                                "op": "gte",
+                                "value": 0.0,
+                                "missing_policy": "drop",
+                            }
+                            filters_cfg["sma_200_gap"] = {
+                                "enabled": True,
+                                "field": "sma_200_gap",
+                                "op": "gte",
+                                "value": 0.0,
+                                "missing_policy": "drop",
+                            }
+
+                        selection_cfg: dict[str, Any] = {
+                            "mode": bt_selection_mode,
+                            "empty_selection_policy": "cash",
+                            "entry_rank": None,
+                            "exit_rank": None,
+                            "entry_pct": None,
+                            "exit_pct": None,
                         }
+                        if bt_selection_mode == "cap_n":
+                            selection_cfg.update(
+                                {
+                                    "cap_n": int(bt_cap_n),
+                                    "sort_by": selected_foreign_signal["sort_by"],
+                                    "sort_direction": "desc",
+                                    "min_holdings": 1,
+                                }
+                            )
 
-                    selection_cfg: dict[str, Any] = {
-                        "mode": bt_selection_mode,
-                        "empty_selection_policy": "cash",
-                        "entry_rank": None,
-                        "exit_rank": None,
-                        "entry_pct": None,
-                        "exit_pct": None,
-                    }
-                    if bt_selection_mode == "cap_n":
-                        selection_cfg.update(
-                            {
-                                "cap_n": int(bt_cap_n),
-                                "sort_by": selected_foreign_signal["sort_by"],
-                                "sort_direction": "desc",
-                                "min_holdings": 1,
-                            }
+                        universe_cfg: dict[str, Any] = {}
+                        if float(bt_min_avg_value_eok) > 0:
+                            universe_cfg["min_avg_value_20d"] = float(bt_min_avg_value_eok) * 100_000_000.0
+                        if float(bt_min_mcap_eok) > 0:
+                            universe_cfg["min_mcap"] = float(bt_min_mcap_eok) * 100_000_000.0
+
+                        cfg = BacktestConfig(
+                            run={
+                                "name": "ui_backtest",
+                                "start_date": bt_start,
+                                "end_date": bt_end,
+                                "rebalance": bt_rebalance,
+                                "initial_capital": 100000000.0,
+                            },
+                            universe=universe_cfg,
+                            filters=filters_cfg,
+                            selection=selection_cfg,
+                            portfolio={"weighting": "equal"},
+                            costs={"fee_bps": float(bt_fee_bps), "slippage_bps": float(bt_slippage_bps)},
+                            output={},
                         )
 
-                    universe_cfg: dict[str, Any] = {}
-                    if float(bt_min_avg_value_eok) > 0:
-                        universe_cfg["min_avg_value_20d"] = float(bt_min_avg_value_eok) * 100_000_000.0
-                    if float(bt_min_mcap_eok) > 0:
-                        universe_cfg["min_mcap"] = float(bt_min_mcap_eok) * 100_000_000.0
-
-                    cfg = BacktestConfig(
-                        run={
-                            "name": "ui_backtest",
-                            "start_date": bt_start,
-                            "end_date": bt_end,
-                            "rebalance": bt_rebalance,
-                            "initial_capital": 100000000.0,
-                        },
-                        universe=universe_cfg,
-                        filters=filters_cfg,
-                        selection=selection_cfg,
-                        portfolio={"weighting": "equal"},
-                        costs={"fee_bps": float(bt_fee_bps), "slippage_bps": float(bt_slippage_bps)},
-                        output={},
+                        with st.status("백테스트 실행 중", expanded=True) as backtest_status:
+                            progress_bar = st.progress(0.02)
+
+                            def _on_backtest_progress(evt: dict[str, Any]) -> None:
+                                processed = int(evt.get("processed", 0) or 0)
+                                total = int(evt.get("total", 0) or 0)
+                                eta_seconds = float(evt.get("eta_seconds", 0.0) or 0.0)
+                                stage = str(evt.get("stage", ""))
+                                message = str(evt.get("message", ""))
+                                if total > 0:
+                                    ratio = min(max(processed / total, 0.0), 1.0)
+                                    # 진행 시작 직후(예: 사전 로딩)에도 게이지가 정지된 것처럼 보이지 않도록 하단 5%를 예약한다.
+                                    display_ratio = 0.05 + (ratio * 0.95)
+                                else:
+                                    display_ratio = 0.05 if stage != "done" else 1.0
+                                if total > 0:
+                                    progress_label = f"백테스트 진행중: {processed}/{total} · 단계={stage} · 예상 잔여 {eta_seconds:,.1f}초 · {message}"
+                                else:
+                                    progress_label = f"백테스트 진행중: 단계={stage} · {message}"
+                                # Bar value and text travel in one widget update per progress event.
+                                progress_bar.progress(min(max(display_ratio, 0.0), 1.0), text=progress_label)
+
+                            st.session_state.backtest_result = run_backtest(cfg, repo, progress_callback=_on_backtest_progress)
+                            progress_bar.progress(1.0, text="백테스트가 완료되었습니다.")
+                            backtest_status.update(label="백테스트가 완료되었습니다.", state="complete", expanded=False)
+
+                bt_result = st.session_state.get("backtest_result")
+                if bt_result:
+                    bt_summary = bt_result.get("summary", {})
+                    k1, k2, k3, k4, k5, k6 = st.columns(6)
+                    with k1:
+                        st.metric("최종 자산", f"{float(bt_summary.get('final_equity', 0.0)):,.0f}")
+                    with k2:
+                        st.metric("리밸 횟수", int(bt_summary.get("rebalances", 0)))
+                    with k3:
+                        st.metric("총 비용", f"{float(bt_summary.get('total_costs', 0.0)):,.0f}")
+                    with k4:
+                        st.metric("스킵 횟수", int(bt_summary.get("skipped_rebalances", 0)))
+                    with k5:
+                        st.metric("소요시간(초)", f"{float(bt_summary.get('elapsed_seconds', 0.0)):.1f}")
+                    with k6:
+                        st.metric("추세 필터", "ON" if bool(bt_summary.get("trend_filter_enabled", False)) else "OFF")
+
+                    st.info(
+                        "유니버스 active 판정은 현재 ticker_master.active_flag만 사용 중입니다. "
+                        "향후 listed_from/listed_to 도입 시 dt 기준 상장/상폐 유효기간 판정으로 전환 예정입니다."
                     )
 
-                    progress_text = st.empty()
-                    progress_bar = st.progress(0.02)
-
-                    def _on_backtest_progress(evt: dict[str, Any]) -> None:
-                        processed = int(evt.get("processed", 0) or 0)
-                        total = int(evt.get("total", 0) or 0)
-                        eta_seconds = float(evt.get("eta_seconds", 0.0) or 0.0)
-                        stage = str(evt.get("stage", ""))
-                        message = str(evt.get("message", ""))
-                        if total > 0:
-                            ratio = min(max(processed / total, 0.0), 1.0)
-                            # 진행 시작 직후(예: 사전 로딩)에도 게이지가 정지된 것처럼 보이지 않도록 하단 5%를 예약한다.
-                            display_ratio = 0.05 + (ratio * 0.95)
-                        else:
-                            display_ratio = 0.05 if stage != "done" else 1.0
-                        progress_bar.progress(min(max(display_ratio, 0.0), 1.0))
-                        if total > 0:
-                            progress_text.info(
-                                f"백테스트 진행중: {processed}/{total} · 단계={stage} · 예상 잔여 {eta_seconds:,.1f}초 · {message}"
+                    skipped_rebalances = int(bt_summary.get("skipped_rebalances", 0) or 0)
+                    if skipped_rebalances > 0:
+                        skipped_reasons = bt_summary.get("skipped_rebalance_reasons", {})
+                        if isinstance(skipped_reasons, dict) and skipped_reasons:
+                            reasons_text = ", ".join(f"{key}: {value}" for key, value in sorted(skipped_reasons.items()))
+                            st.warning(
+                                f"일부 리밸런싱이 실행되지 않았습니다 (총 {skipped_rebalances}회). 사유: {reasons_text}"
                             )
                         else:
-                            progress_text.info(f"백테스트 진행중: 단계={stage} · {message}")
-
-                    st.session_state.backtest_result = run_backtest(cfg, repo, progress_callback=_on_backtest_progress)
-                    progress_bar.progress(1.0)
-                    progress_text.success("백테스트가 완료되었습니다.")
-
-            bt_result = st.session_state.get("backtest_result")
-            if bt_result:
-                bt_summary = bt_result.get("summary", {})
-                k1, k2, k3, k4, k5, k6 = st.columns(6)
-                with k1:
-                    st.metric("최종 자산", f"{float(bt_summary.get('final_equity', 0.0)):,.0f}")
-                with k2:
-                    st.metric("리밸 횟수", int(bt_summary.get("rebalances", 0)))
-                with k3:
-                    st.metric("총 비용", f"{float(bt_summary.get('total_costs', 0.0)):,.0f}")
-                with k4:
-                    st.metric("스킵 횟수", int(bt_summary.get("skipped_rebalances", 0)))
-                with k5:
-                    st.metric("소요시간(초)", f"{float(bt_summary.get('elapsed_seconds', 0.0)):.1f}")
-                with k6:
-                    st.metric("추세 필터", "ON" if bool(bt_summary.get("trend_filter_enabled", False)) else "OFF")
-
-                st.info(
-                    "유니버스 active 판정은 현재 ticker_master.active_flag만 사용 중입니다. "
-                    "향후 listed_from/listed_to 도입 시 dt 기준 상장/상폐 유효기간 판정으로 전환 예정입니다."
-                )
-
-                skipped_rebalances = int(bt_summary.get("skipped_rebalances", 0) or 0)
-                if skipped_rebalances > 0:
-                    skipped_reasons = bt_summary.get("skipped_rebalance_reasons", {})
-                    if isinstance(skipped_reasons, dict) and skipped_reasons:
-                        reasons_text = ", ".join(f"{key}: {value}" for key, value in sorted(skipped_reasons.items()))
-                        st.warning(
-                            f"일부 리밸런싱이 실행되지 않았습니다 (총 {skipped_rebalances}회). 사유: {reasons_text}"
-                        )
-                    else:
-                        st.warning(f"일부 리밸런싱이 실행되지 않았습니다 (총 {skipped_rebalances}회).")
-
-                bt_curve = bt_result.get("equity_curve", pd.DataFrame())
-                if isinstance(bt_curve, pd.DataFrame) and not bt_curve.empty:
-                    chart_df = bt_curve.copy()
-                    chart_df["date"] = pd.to_datetime(chart_df["date"])
-
-                    benchmark_key = bt_benchmark_ticker.strip().upper()
-                    benchmark_panel = pd.DataFrame(columns=["date", "close"])
-                    benchmark_source = "db_ticker"
-
-                    if benchmark_key in {"KOSPI", "1001", "^KS11"}:
-                        benchmark_source = "pykrx_kospi"
-                        try:
-                            idx_frame = stock.get_index_ohlcv_by_date(
-                                bt_start.replace("-", ""),
-                                bt_end.replace("-", ""),
-                                "1001",
+                            st.warning(f"일부 리밸런싱이 실행되지 않았습니다 (총 {skipped_rebalances}회).")
+
+                    bt_curve = bt_result.get("equity_curve", pd.DataFrame())
+                    if isinstance(bt_curve, pd.DataFrame) and not bt_curve.empty:
+                        chart_df = bt_curve.copy()
+                        chart_df["date"] = pd.to_datetime(chart_df["date"])
+
+                        benchmark_key = bt_benchmark_ticker.strip().upper()
+                        benchmark_panel = pd.DataFrame(columns=["date", "close"])
+                        benchmark_source = "db_ticker"
+
+                        if benchmark_key in {"KOSPI", "1001", "^KS11"}:
+                            benchmark_source = "pykrx_kospi"
+                            try:
+                                idx_frame = stock.get_index_ohlcv_by_date(
+                                    bt_start.replace("-", ""),
+                                    bt_end.replace("-", ""),
+                                    "1001",
+                                )
+                                if not idx_frame.empty:
+                                    idx_norm = idx_frame.reset_index().rename(columns={"날짜": "date", "종가": "close"})
+                                    benchmark_panel = idx_norm[["date", "close"]]
+                            except Exception as exc:
+                                st.warning(f"KOSPI 벤치마크 조회 실패: {exc}")
+                        else:
+                            ticker_panel = repo.get_price_panel([bt_benchmark_ticker.strip()], bt_start, bt_end)
+                            if not ticker_panel.empty:
+                                benchmark_panel = ticker_panel[["date", "close"]]
+
+                        benchmark_panel = benchmark_panel.dropna(subset=["close"]) if not benchmark_panel.empty else benchmark_panel
+                        if benchmark_panel.empty:
+                            st.warning(
+                                f"벤치마크({bt_benchmark_ticker}) 데이터가 없어 전략 단독 곡선만 표시합니다. "
+                                "티커 벤치마크는 배치 수집 대상에 포함된 종목만 비교 가능합니다."
                             )
-                            if not idx_frame.empty:
-                                idx_norm = idx_frame.reset_index().rename(columns={"날짜": "date", "종가": "close"})
-                                benchmark_panel = idx_norm[["date", "close"]]
-                        except Exception as exc:
-                            st.warning(f"KOSPI 벤치마크 조회 실패: {exc}")
-                    else:
-                        ticker_panel = repo.get_price_panel([bt_benchmark_ticker.strip()], bt_start, bt_end)
-                        if not ticker_panel.empty:
-                            benchmark_panel = ticker_panel[["date", "close"]]
-
-                    benchmark_panel = benchmark_panel.dropna(subset=["close"]) if not benchmark_panel.empty else benchmark_panel
-                    if benchmark_panel.empty:
-                        st.warning(
-                            f"벤치마크({bt_benchmark_ticker}) 데이터가 없어 전략 단독 곡선만 표시합니다. "
-                            "티커 벤치마크는 배치 수집 대상에 포함된 종목만 비교 가능합니다."
-                        )
-                        st.line_chart(chart_df.set_index("date")[["equity_close"]], use_container_width=True)
-                    else:
-                        bench = benchmark_panel[["date", "close"]].copy()
-                        bench["date"] = pd.to_datetime(bench["date"])
-                        initial_capital = 100000000.0
-                        bench = bench.sort_values("date")
-                        bench["benchmark_nav"] = initial_capital * (bench["close"] / float(bench["close"].iloc[0]))
-                        merged = chart_df[["date", "equity_close"]].merge(bench[["date", "benchmark_nav"]], on="date", how="left")
-                        merged = merged.ffill().dropna(subset=["equity_close", "benchmark_nav"]) 
-
-                        if merged.empty:
-                            st.warning(f"벤치마크({bt_benchmark_ticker})와 전략 기간이 겹치지 않아 전략 단독 곡선만 표시합니다.")
                             st.line_chart(chart_df.set_index("date")[["equity_close"]], use_container_width=True)
                         else:
-                            st.caption(f"벤치마크 소스: {'pykrx KOSPI(1001)' if benchmark_source == 'pykrx_kospi' else 'DB ticker'}")
-                            st.line_chart(merged.set_index("date")[["equity_close", "benchmark_nav"]], use_container_width=True)
-                            merged["excess_return"] = (merged["equity_close"] / merged["benchmark_nav"]) - 1.0
-                            st.line_chart(merged.set_index("date")[["excess_return"]], use_container_width=True)
-
-                            strategy_ret = (float(merged["equity_close"].iloc[-1]) / float(merged["equity_close"].iloc[0])) - 1.0
-                            bench_ret = (float(merged["benchmark_nav"].iloc[-1]) / float(merged["benchmark_nav"].iloc[0])) - 1.0
-                            alpha = strategy_ret - bench_ret
-                            b1, b2, b3 = st.columns(3)
-                            with b1:
-                                st.metric("전략 누적수익", f"{strategy_ret * 100:.2f}%")
-                            with b2:
-                                st.metric("벤치마크 누적수익", f"{bench_ret * 100:.2f}%")
-                            with b3:
-                                st.metric("초과수익", f"{alpha * 100:.2f}%")
-                bt_log = bt_result.get("rebalance_log", pd.DataFrame())
-                if isinstance(bt_log, pd.DataFrame) and not bt_log.empty:
-                    preferred_cols = [
-                        "signal_date",
-                        "exec_date",
-                        "selected_count",
-                        "selected_tickers",
-                        "turnover_notional",
-                        "costs",
-                        "skipped",
-                        "skip_reason",
-                    ]
-                    visible_cols = [col for col in preferred_cols if col in bt_log.columns]
-                    st.dataframe(bt_log[visible_cols], width="stretch", hide_index=True)
-
-                    if "diagnostics" in bt_log.columns:
-                        with st.expander("리밸런싱 진단 로그 보기"):
-                            diag_cols = [col for col in ["signal_date", "exec_date", "diagnostics"] if col in bt_log.columns]
-                            st.dataframe(bt_log[diag_cols], width="stretch", hide_index=True)
-
-                bt_run_log = bt_result.get("run_log", pd.DataFrame())
-                if isinstance(bt_run_log, pd.DataFrame) and not bt_run_log.empty:
-                    st.markdown("##### 실행 진행 로그")
-                    run_log_cols = [
-                        "signal_date",
-                        "exec_date",
-                        "stage",
-                        "status",
-                        "message",
-                        "universe_count",
-                        "filtered_count",
-                        "selected_count",
-                    ]
-                    visible_run_log_cols = [col for col in run_log_cols if col in bt_run_log.columns]
-                    st.dataframe(bt_run_log[visible_run_log_cols], width="stretch", hide_index=True)
-
-filtered = base.copy()
-missing_tickers: list[str] = []
-if ticker_list:
-    available_tickers = set(filtered["ticker"].astype(str).str.strip().str.upper())
-    missing_tickers = [ticker for ticker in ticker_list if ticker not in available_tickers]
-    filtered = filtered[filtered["ticker"].astype(str).str.strip().str.upper().isin(ticker_list)]
-
-if mkt:
-    filtered = filtered[filtered["market"].isin(mkt)]
-if mcap_filter_mode == "구간 선택":
-    mcap_min, mcap_max = MCAP_BUCKETS.get(mcap_bucket, (None, None))
-    if mcap_min is not None:
-        filtered = filtered[filtered["mcap"] >= mcap_min]
-    if mcap_max is not None:
-        filtered = filtered[filtered["mcap"] < mcap_max]
-elif mcap_filter_mode == "직접 입력":
-    if mcap_min_custom > 0:
-        filtered = filtered[filtered["mcap"] >= mcap_min_custom]
-    if mcap_max_custom > 0:
-        filtered = filtered[filtered["mcap"] <= mcap_max_custom]
-
-if price_filter_mode == "구간 선택":
-    price_min, price_max = PRICE_BUCKETS.get(price_bucket, (None, None))
-    if price_min is not None:
-        filtered = filtered[filtered["close"] >= price_min]
-    if price_max is not None:
-        filtered = filtered[filtered["close"] < price_max]
-elif price_filter_mode == "직접 입력":
-    if price_min_custom > 0:
-        filtered = filtered[filtered["close"] >= price_min_custom]
-    if price_max_custom > 0:
-        filtered = filtered[filtered["close"] <= price_max_custom]
-
-if div_filter_mode == "구간 선택":
-    div_min, div_max = DIV_BUCKETS.get(div_bucket, (None, None))
-    if div_bucket == "무배당(0%)":
-        filtered = filtered[filtered["div"].fillna(0.0) == 0.0]
-    else:
-        filtered = filtered[filtered["div"].notna()]
-        if div_min is not None:
-            filtered = filtered[filtered["div"] >= div_min]
-        if div_max is not None:
-            filtered = filtered[filtered["div"] <= div_max]
-elif div_filter_mode == "직접 입력":
-    filtered = filtered[filtered["div"].notna()]
-    if div_min_custom > 0:
-        filtered = filtered[filtered["div"] >= div_min_custom]
-    if div_max_custom > 0:
-        filtered = filtered[filtered["div"] <= div_max_custom]
-
-if relvol_filter_mode == "구간 선택":
-    relvol_min, relvol_max = RELVOL_BUCKETS.get(relvol_bucket, (None, None))
-    filtered = filtered[filtered["relative_value"].notna()]
-    if relvol_min is not None:
-        filtered = filtered[filtered["relative_value"] >= relvol_min]
-    if relvol_max is not None:
-        filtered = filtered[filtered["relative_value"] <= relvol_max]
-elif relvol_filter_mode == "직접 입력":
-    filtered = filtered[filtered["relative_value"].notna()]
-    if relvol_min_custom > 0:
-        filtered = filtered[filtered["relative_value"] >= relvol_min_custom]
-    if relvol_max_custom > 0:
-        filtered = filtered[filtered["relative_value"] <= relvol_max_custom]
-
-if momentum_available and momentum_filter_mode == "구간 선택":
-    momentum_min, momentum_max = MOMENTUM_BUCKETS.get(momentum_bucket, (None, None))
-    filtered = filtered[filtered[momentum_metric].notna()]
-    if momentum_min is not None:
-        filtered = filtered[filtered[momentum_metric] >= momentum_min]
-    if momentum_max is not None:
-        filtered = filtered[filtered[momentum_metric] <= momentum_max]
-elif momentum_available and momentum_filter_mode == "직접 입력":
-    filtered = filtered[filtered[momentum_metric].notna()]
-    if momentum_min_custom != 0:
-        filtered = filtered[filtered[momentum_metric] >= momentum_min_custom]
-    if momentum_max_custom != 0:
-        filtered = filtered[filtered[momentum_metric] <= momentum_max_custom]
-
-if avg_value_available and value_filter_mode == "구간 선택":
-    value_min, value_max = VALUE_BUCKETS.get(value_bucket, (None, None))
-    filtered = filtered[filtered["avg_value_20d"].notna()]
-    if value_min is not None:
-        filtered = filtered[filtered["avg_value_20d"] >= value_min]
-    if value_max is not None:
-        filtered = filtered[filtered["avg_value_20d"] < value_max]
-elif avg_value_available and value_filter_mode == "직접 입력":
-    filtered = filtered[filtered["avg_value_20d"].notna()]
-    if value_min_custom > 0:
-        filtered = filtered[filtered["avg_value_20d"] >= value_min_custom]
-    if value_max_custom > 0:
-        filtered = filtered[filtered["avg_value_20d"] <= value_max_custom]
-if apply_pbr_max:
-    filtered = filtered[(filtered["pbr"].notna()) & (filtered["pbr"] > 0) & (filtered["pbr"] <= pbr_max)]
-if apply_reserve_ratio_min:
-    filtered = filtered[(filtered["reserve_ratio"].notna()) & (filtered["reserve_ratio"] >= reserve_ratio_min)]
-if apply_roe_min:
-    filtered = filtered[(filtered["roe_proxy"].notna()) & (filtered["roe_proxy"] > 0) & (filtered["roe_proxy"] >= roe_min)]
-if apply_eps_positive:
-    filtered = filtered[filtered["eps_positive"] == 1]
-if fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode == "구간 선택":
-    ev_ebitda_min, ev_ebitda_max = EV_EBITDA_BUCKETS.get(ev_ebitda_bucket, (None, None))
-    filtered = filtered[filtered["ev_ebitda"].notna()]
-    if ev_ebitda_min is not None:
-        filtered = filtered[filtered["ev_ebitda"] >= ev_ebitda_min]
-    if ev_ebitda_max is not None:
-        filtered = filtered[filtered["ev_ebitda"] <= ev_ebitda_max]
-elif fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode == "직접 입력":
-    filtered = filtered[filtered["ev_ebitda"].notna()]
-    if ev_ebitda_min_custom != 0:
-        filtered = filtered[filtered["ev_ebitda"] >= ev_ebitda_min_custom]
-    if ev_ebitda_max_custom != 0:
-        filtered = filtered[filtered["ev_ebitda"] <= ev_ebitda_max_custom]
-if technical_metric_availability["rsi_14"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="rsi_14",
-        mode=st.session_state.get("rsi_filter_mode", "Any"),
-        bucket=st.session_state.get("rsi_bucket", "전체"),
-        bucket_map=RSI_BUCKETS,
-        min_custom=st.session_state.get("rsi_min_custom", 0.0),
-        max_custom=st.session_state.get("rsi_max_custom", 0.0),
-    )
-if technical_metric_availability["dist_sma20"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="dist_sma20",
-        mode=st.session_state.get("dist_sma20_filter_mode", "Any"),
-        bucket=st.session_state.get("dist_sma20_bucket", "전체"),
-        bucket_map=DIST_SMA_BUCKETS,
-        min_custom=st.session_state.get("dist_sma20_min_custom", 0.0),
-        max_custom=st.session_state.get("dist_sma20_max_custom", 0.0),
-    )
-if technical_metric_availability["dist_sma50"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="dist_sma50",
-        mode=st.session_state.get("dist_sma50_filter_mode", "Any"),
-        bucket=st.session_state.get("dist_sma50_bucket", "전체"),
-        bucket_map=DIST_SMA_BUCKETS,
-        min_custom=st.session_state.get("dist_sma50_min_custom", 0.0),
-        max_custom=st.session_state.get("dist_sma50_max_custom", 0.0),
-    )
-if technical_metric_availability["dist_sma200"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="dist_sma200",
-        mode=st.session_state.get("dist_sma200_filter_mode", "Any"),
-        bucket=st.session_state.get("dist_sma200_bucket", "전체"),
-        bucket_map=DIST_SMA_BUCKETS,
-        min_custom=st.session_state.get("dist_sma200_min_custom", 0.0),
-        max_custom=st.session_state.get("dist_sma200_max_custom", 0.0),
-    )
-if technical_metric_availability["near_52w_high_ratio"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="near_52w_high_ratio",
-        mode=st.session_state.get("near_high_filter_mode", "Any"),
-        bucket=st.session_state.get("near_high_bucket", "전체"),
-        bucket_map=NEAR_HIGH_BUCKETS,
-        min_custom=st.session_state.get("near_high_min_custom", 0.0),
-        max_custom=st.session_state.get("near_high_max_custom", 0.0),
-    )
-if technical_metric_availability["pos_52w"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="pos_52w",
-        mode=st.session_state.get("near_low_filter_mode", "Any"),
-        bucket=st.session_state.get("near_low_bucket", "전체"),
-        bucket_map=NEAR_LOW_BUCKETS,
-        min_custom=st.session_state.get("near_low_min_custom", 0.0),
-        max_custom=st.session_state.get("near_low_max_custom", 0.0),
-    )
-if technical_metric_availability["atr_14"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="atr_14",
-        mode=st.session_state.get("atr_filter_mode", "Any"),
-        bucket=st.session_state.get("atr_bucket", "전체"),
-        bucket_map=ATR_BUCKETS,
-        min_custom=st.session_state.get("atr_min_custom", 0.0),
-        max_custom=st.session_state.get("atr_max_custom", 0.0),
-    )
-if technical_metric_availability["gap_pct"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="gap_pct",
-        mode=st.session_state.get("gap_filter_mode", "Any"),
-        bucket=st.session_state.get("gap_bucket", "전체"),
-        bucket_map=GAP_BUCKETS,
-        min_custom=st.session_state.get("gap_min_custom", 0.0),
-        max_custom=st.session_state.get("gap_max_custom", 0.0),
-    )
-if technical_metric_availability["chg_from_open_pct"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="chg_from_open_pct",
-        mode=st.session_state.get("chg_open_filter_mode", "Any"),
-        bucket=st.session_state.get("chg_open_bucket", "전체"),
-        bucket_map=CHG_OPEN_BUCKETS,
-        min_custom=st.session_state.get("chg_open_min_custom", 0.0),
-        max_custom=st.session_state.get("chg_open_max_custom", 0.0),
-    )
-if technical_metric_availability["volatility_20d"]:
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col="volatility_20d",
-        mode=st.session_state.get("volatility_filter_mode", "Any"),
-        bucket=st.session_state.get("volatility_bucket", "전체"),
-        bucket_map=VOLATILITY_BUCKETS,
-        min_custom=st.session_state.get("volatility_min_custom", 0.0),
-        max_custom=st.session_state.get("volatility_max_custom", 0.0),
-    )
-selected_foreign_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-st.session_state.foreign_buy_metric = selected_foreign_metric
-if technical_metric_availability.get(selected_foreign_metric, False):
-    filtered = _apply_range_mode_filter(
-        filtered,
-        col=selected_foreign_metric,
-        mode=st.session_state.get("foreign_buy_filter_mode", "Any"),
-        bucket=st.session_state.get("foreign_buy_bucket", "전체"),
-        bucket_map=FOREIGN_BUY_METRIC_CONFIGS.get(
-            selected_foreign_metric,
-            FOREIGN_BUY_METRIC_CONFIGS["foreign_net_buy_value_20d"],
-        )["bucket_options"],
-        min_custom=st.session_state.get("foreign_buy_min_custom", 0.0),
-        max_custom=st.session_state.get("foreign_buy_max_custom", 0.0),
-        exclude_zero=True,
-    )
-if apply_eps_cagr_5y:
-    filtered = filtered[(filtered["eps_cagr_5y"].notna()) & (filtered["eps_cagr_5y"] >= eps_cagr_5y_min)]
-if apply_eps_yoy_q:
-    filtered = filtered[(filtered["eps_yoy_q"].notna()) & (filtered["eps_yoy_q"] >= eps_yoy_q_min)]
-if apply_eps_qoq:
-    filtered = filtered[(filtered["eps_qoq"].notna()) & (filtered["eps_qoq"] >= eps_qoq_min)]
-if apply_sales_growth_qoq:
-    filtered = filtered[(filtered["sales_growth_qoq"].notna()) & (filtered["sales_growth_qoq"] >= sales_growth_qoq_min)]
-if apply_sales_growth_ttm:
-    filtered = filtered[(filtered["sales_growth_ttm"].notna()) & (filtered["sales_growth_ttm"] >= sales_growth_ttm_min)]
-if apply_sales_cagr_5y:
-    filtered = filtered[(filtered["sales_cagr_5y"].notna()) & (filtered["sales_cagr_5y"] >= sales_cagr_5y_min)]
-if apply_has_price_5y and "has_price_5y" in filtered.columns:
-    filtered = filtered[filtered["has_price_5y"] == 1]
-if apply_has_price_10y and "has_price_10y" in filtered.columns:
-    filtered = filtered[filtered["has_price_10y"] == 1]
-sort_candidates = [
-    "mcap", "pbr", "reserve_ratio", "roe_proxy", "ret_3m", "ret_6m", "ret_1y", "near_52w_high_ratio", "pos_52w", "div",
-    "avg_value_20d", "current_value", "relative_value", "ev_ebitda", "eps_cagr_5y", "eps_yoy_q", "eps_qoq", "sales_growth_qoq", "sales_growth_ttm", "sales_cagr_5y",
-    "rsi_14", "dist_sma20", "dist_sma50", "dist_sma200", "atr_14", "gap_pct", "chg_from_open_pct", "volatility_20d",
-    "foreign_net_buy_volume", "foreign_net_buy_volume_20d", "foreign_net_buy_volume_60d", "foreign_net_buy_value", "foreign_net_buy_value_20d", "foreign_net_buy_value_60d", "foreign_net_buy_value_20d_mcap_ratio", "foreign_net_buy_value_60d_mcap_ratio",
-]
-selected_sort_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-if selected_sort_metric in sort_candidates:
-    sort_candidates = [selected_sort_metric] + [candidate for candidate in sort_candidates if candidate != selected_sort_metric]
-
-sort_col = st.selectbox(
-    "정렬 컬럼",
-    sort_candidates,
-    key="sort_col",
-)
-ascending = st.checkbox("오름차순", key="ascending")
-limit = st.slider("출력 개수", min_value=10, max_value=500, step=10, key="limit")
-
-effective_ascending = ascending
-if apply_pbr_max and sort_col == "pbr":
-    effective_ascending = True
-    if not ascending:
-        st.caption("최대 PBR 적용 시에는 저PBR 탐색을 위해 PBR 오름차순으로 정렬합니다.")
-
-query_filter_state: dict[str, Any] = {}
-for spec in FILTER_SPECS:
-    serialized = _serialize_query_filter_value(spec, st.session_state.get(spec.name, spec.default))
-    if serialized is not None:
-        query_filter_state[spec.name] = serialized
-
-query_filter_state = prune_query_filter_state(query_filter_state, st.session_state)
-
-_set_query_params(query_filter_state)
-
-share_query_string = urlencode(query_filter_state, doseq=True)
-share_link = f"?{share_query_string}" if share_query_string else ""
-st.caption("필터 상태가 URL에 자동 반영됩니다. 링크를 복사해 동일한 조건을 공유할 수 있습니다.")
-st.code(share_link or "(기본 필터 상태: 공유할 추가 파라미터 없음)", language="text")
-st.button("공유 링크 복사", disabled=True, help="브라우저 주소창 URL을 복사해 공유하세요.")
-
-filtered = filtered.sort_values(sort_col, ascending=effective_ascending).head(limit)
-
-if ticker_list:
-    st.caption(f"티커 직접 입력: {len(ticker_list)}개 중 {len(ticker_list) - len(missing_tickers)}개 매칭")
-    if missing_tickers:
-        st.warning("snapshot에 없는 티커: " + ", ".join(missing_tickers))
-
-if filtered.empty:
-    st.warning("조건을 만족하는 종목이 없습니다. Growth 조건(EPS CAGR/EPS YoY) 임계값을 낮추거나 체크를 해제해 보세요.")
-
-condition_summaries: list[str] = []
-if ticker_list:
-    condition_summaries.append(f"티커 {len(ticker_list)}")
-if mkt:
-    condition_summaries.append(f"시장 {', '.join(mkt)}")
-if mcap_filter_mode != "Any":
-    condition_summaries.append(f"시총 {_format_range_summary(mcap_filter_mode, mcap_bucket, mcap_min_custom, mcap_max_custom)}")
-if price_filter_mode != "Any":
-    condition_summaries.append(f"가격 {_format_range_summary(price_filter_mode, price_bucket, price_min_custom, price_max_custom)}")
-if div_filter_mode != "Any":
-    condition_summaries.append(f"배당 {_format_range_summary(div_filter_mode, div_bucket, div_min_custom, div_max_custom)}")
-if avg_value_available and value_filter_mode != "Any":
-    condition_summaries.append(
-        f"평균 거래대금(20D) {_format_range_summary(value_filter_mode, value_bucket, value_min_custom, value_max_custom)}"
-    )
-if relative_value_available and relvol_filter_mode != "Any":
-    condition_summaries.append(
-        f"상대거래량(현재/20D) {_format_range_summary(relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom)}"
-    )
-if momentum_available and momentum_filter_mode != "Any":
-    condition_summaries.append(
-        f"{MOMENTUM_METRICS.get(momentum_metric, momentum_metric)} {_format_range_summary(momentum_filter_mode, momentum_bucket, momentum_min_custom, momentum_max_custom)}"
-    )
-if fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode != "Any":
-    condition_summaries.append(
-        f"EV/EBITDA {_format_range_summary(ev_ebitda_filter_mode, ev_ebitda_bucket, ev_ebitda_min_custom, ev_ebitda_max_custom)}"
-    )
-if st.session_state.get("rsi_filter_mode") != "Any":
-    condition_summaries.append(
-        f"RSI(14) {_format_range_summary(st.session_state.get('rsi_filter_mode', 'Any'), st.session_state.get('rsi_bucket', '전체'), st.session_state.get('rsi_min_custom', 0.0), st.session_state.get('rsi_max_custom', 0.0))}"
-    )
-if st.session_state.get("dist_sma20_filter_mode") != "Any":
-    condition_summaries.append(
-        f"20일선 대비 {_format_range_summary(st.session_state.get('dist_sma20_filter_mode', 'Any'), st.session_state.get('dist_sma20_bucket', '전체'), st.session_state.get('dist_sma20_min_custom', 0.0), st.session_state.get('dist_sma20_max_custom', 0.0))}"
-    )
-if st.session_state.get("dist_sma50_filter_mode") != "Any":
-    condition_summaries.append(
-        f"50일선 대비 {_format_range_summary(st.session_state.get('dist_sma50_filter_mode', 'Any'), st.session_state.get('dist_sma50_bucket', '전체'), st.session_state.get('dist_sma50_min_custom', 0.0), st.session_state.get('dist_sma50_max_custom', 0.0))}"
-    )
-if st.session_state.get("dist_sma200_filter_mode") != "Any":
-    condition_summaries.append(
-        f"200일선 대비 {_format_range_summary(st.session_state.get('dist_sma200_filter_mode', 'Any'), st.session_state.get('dist_sma200_bucket', '전체'), st.session_state.get('dist_sma200_min_custom', 0.0), st.session_state.get('dist_sma200_max_custom', 0.0))}"
-    )
-if st.session_state.get("near_high_filter_mode") != "Any":
-    condition_summaries.append(
-        f"52주 High 근접 {_format_range_summary(st.session_state.get('near_high_filter_mode', 'Any'), st.session_state.get('near_high_bucket', '전체'), st.session_state.get('near_high_min_custom', 0.0), st.session_state.get('near_high_max_custom', 0.0))}"
-    )
-if st.session_state.get("near_low_filter_mode") != "Any":
-    condition_summaries.append(
-        f"52주 Low 근접 {_format_range_summary(st.session_state.get('near_low_filter_mode', 'Any'), st.session_state.get('near_low_bucket', '전체'), st.session_state.get('near_low_min_custom', 0.0), st.session_state.get('near_low_max_custom', 0.0))}"
-    )
-if st.session_state.get("atr_filter_mode") != "Any":
-    condition_summaries.append(
-        f"ATR(14) {_format_range_summary(st.session_state.get('atr_filter_mode', 'Any'), st.session_state.get('atr_bucket', '전체'), st.session_state.get('atr_min_custom', 0.0), st.session_state.get('atr_max_custom', 0.0))}"
-    )
-if st.session_state.get("gap_filter_mode") != "Any":
-    condition_summaries.append(
-        f"Gap% {_format_range_summary(st.session_state.get('gap_filter_mode', 'Any'), st.session_state.get('gap_bucket', '전체'), st.session_state.get('gap_min_custom', 0.0), st.session_state.get('gap_max_custom', 0.0))}"
-    )
-if st.session_state.get("chg_open_filter_mode") != "Any":
-    condition_summaries.append(
-        f"시가대비 등락률 {_format_range_summary(st.session_state.get('chg_open_filter_mode', 'Any'), st.session_state.get('chg_open_bucket', '전체'), st.session_state.get('chg_open_min_custom', 0.0), st.session_state.get('chg_open_max_custom', 0.0))}"
-    )
-if st.session_state.get("volatility_filter_mode") != "Any":
-    condition_summaries.append(
-        f"변동성(20D) {_format_range_summary(st.session_state.get('volatility_filter_mode', 'Any'), st.session_state.get('volatility_bucket', '전체'), st.session_state.get('volatility_min_custom', 0.0), st.session_state.get('volatility_max_custom', 0.0))}"
+                            bench = benchmark_panel[["date", "close"]].copy()
+                            bench["date"] = pd.to_datetime(bench["date"])
+                            initial_capital = 100000000.0
+                            bench = bench.sort_values("date")
+                            bench["benchmark_nav"] = initial_capital * (bench["close"] / float(bench["close"].iloc[0]))
+                            merged = chart_df[["date", "equity_close"]].merge(bench[["date", "benchmark_nav"]], on="date", how="left")
+                            merged = merged.ffill().dropna(subset=["equity_close", "benchmark_nav"]) 
+
+                            if merged.empty:
+                                st.warning(f"벤치마크({bt_benchmark_ticker})와 전략 기간이 겹치지 않아 전략 단독 곡선만 표시합니다.")
+                                st.line_chart(chart_df.set_index("date")[["equity_close"]], use_container_width=True)
+                            else:
+                                st.caption(f"벤치마크 소스: {'pykrx KOSPI(1001)' if benchmark_source == 'pykrx_kospi' else 'DB ticker'}")
+                                st.line_chart(merged.set_index("date")[["equity_close", "benchmark_nav"]], use_container_width=True)
+                                merged["excess_return"] = (merged["equity_close"] / merged["benchmark_nav"]) - 1.0
+                                st.line_chart(merged.set_index("date")[["excess_return"]], use_container_width=True)
+
+                                strategy_ret = (float(merged["equity_close"].iloc[-1]) / float(merged["equity_close"].iloc[0])) - 1.0
+                                bench_ret = (float(merged["benchmark_nav"].iloc[-1]) / float(merged["benchmark_nav"].iloc[0])) - 1.0
+                                alpha = strategy_ret - bench_ret
+                                b1, b2, b3 = st.columns(3)
+                                with b1:
+                                    st.metric("전략 누적수익", f"{strategy_ret * 100:.2f}%")
+                                with b2:
+                                    st.metric("벤치마크 누적수익", f"{bench_ret * 100:.2f}%")
+                                with b3:
+                                    st.metric("초과수익", f"{alpha * 100:.2f}%")
+                    bt_log = bt_result.get("rebalance_log", pd.DataFrame())
+                    if isinstance(bt_log, pd.DataFrame) and not bt_log.empty:
+                        preferred_cols = [
+                            "signal_date",
+                            "exec_date",
+                            "selected_count",
+                            "selected_tickers",
+                            "turnover_notional",
+                            "costs",
+                            "skipped",
+                            "skip_reason",
+                        ]
+                        visible_cols = [col for col in preferred_cols if col in bt_log.columns]
+                        st.dataframe(bt_log[visible_cols], width="stretch", hide_index=True)
+
+                        if "diagnostics" in bt_log.columns:
+                            with st.expander("리밸런싱 진단 로그 보기"):
+                                diag_cols = [col for col in ["signal_date", "exec_date", "diagnostics"] if col in bt_log.columns]
+                                st.dataframe(bt_log[diag_cols], width="stretch", hide_index=True)
+
+                    bt_run_log = bt_result.get("run_log", pd.DataFrame())
+                    if isinstance(bt_run_log, pd.DataFrame) and not bt_run_log.empty:
+                        st.markdown("##### 실행 진행 로그")
+                        run_log_cols = [
+                            "signal_date",
+                            "exec_date",
+                            "stage",
+                            "status",
+                            "message",
+                            "universe_count",
+                            "filtered_count",
+                            "selected_count",
+                        ]
+                        visible_run_log_cols = [col for col in run_log_cols if col in bt_run_log.columns]
+                        st.dataframe(bt_run_log[visible_run_log_cols], width="stretch", hide_index=True)
+
+    screen_mask = np.ones(len(base), dtype=bool)
+    missing_tickers: list[str] = []
+    if ticker_list:
+        ticker_positions = snapshot_meta["ticker_positions"]
+        missing_tickers = [ticker for ticker in ticker_list if ticker not in ticker_positions]
+        ticker_mask = np.zeros(len(base), dtype=bool)
+        ticker_mask[[ticker_positions[ticker] for ticker in ticker_list if ticker in ticker_positions]] = True
+        screen_mask &= ticker_mask
+
+    if mkt:
+        screen_mask &= _category_isin_mask(base["market"], mkt)
+    # Ticker and market run first because they are the most selective predicates. When they leave
+    # only a small slice of the snapshot, evaluate the numeric ranges on the survivors alone.
+    candidates = base
+    if (ticker_list or mkt) and 4 * np.count_nonzero(screen_mask) < len(base):
+        candidates = base.iloc[screen_mask]
+        screen_mask = np.ones(len(candidates), dtype=bool)
+    if mcap_filter_mode == "구간 선택":
+        mcap_values = candidates["mcap"].to_numpy()
+        mcap_min, mcap_max = MCAP_BUCKETS.get(mcap_bucket, (None, None))
+        if mcap_min is not None:
+            screen_mask &= mcap_values >= mcap_min
+        if mcap_max is not None:
+            screen_mask &= mcap_values < mcap_max
+    elif mcap_filter_mode == "직접 입력":
+        mcap_values = candidates["mcap"].to_numpy()
+        if mcap_min_custom > 0:
+            screen_mask &= mcap_values >= mcap_min_custom
+        if mcap_max_custom > 0:
+            screen_mask &= mcap_values <= mcap_max_custom
+
+    if price_filter_mode == "구간 선택":
+        close_values = candidates["close"].to_numpy()
+        price_min, price_max = PRICE_BUCKETS.get(price_bucket, (None, None))
+        if price_min is not None:
+            screen_mask &= close_values >= price_min
+        if price_max is not None:
+            screen_mask &= close_values < price_max
+    elif price_filter_mode == "직접 입력":
+        close_values = candidates["close"].to_numpy()
+        if price_min_custom > 0:
+            screen_mask &= close_values >= price_min_custom
+        if price_max_custom > 0:
+            screen_mask &= close_values <= price_max_custom
+
+    if div_filter_mode == "구간 선택":
+        div_values = candidates["div"].to_numpy()
+        div_min, div_max = DIV_BUCKETS.get(div_bucket, (None, None))
+        if div_bucket == "무배당(0%)":
+            screen_mask &= np.isnan(div_values) | (div_values == 0.0)
+        else:
+            screen_mask &= ~np.isnan(div_values)
+            if div_min is not None:
+                screen_mask &= div_values >= div_min
+            if div_max is not None:
+                screen_mask &= div_values <= div_max
+    elif div_filter_mode == "직접 입력":
+        div_values = candidates["div"].to_numpy()
+        screen_mask &= ~np.isnan(div_values)
+        if div_min_custom > 0:
+            screen_mask &= div_values >= div_min_custom
+        if div_max_custom > 0:
+            screen_mask &= div_values <= div_max_custom
+
+    if relvol_filter_mode == "구간 선택":
+        relvol_values = candidates["relative_value"].to_numpy()
+        relvol_min, relvol_max = RELVOL_BUCKETS.get(relvol_bucket, (None, None))
+        screen_mask &= ~np.isnan(relvol_values)
+        if relvol_min is not None:
+            screen_mask &= relvol_values >= relvol_min
+        if relvol_max is not None:
+            screen_mask &= relvol_values <= relvol_max
+    elif relvol_filter_mode == "직접 입력":
+        relvol_values = candidates["relative_value"].to_numpy()
+        screen_mask &= ~np.isnan(relvol_values)
+        if relvol_min_custom > 0:
+            screen_mask &= relvol_values >= relvol_min_custom
+        if relvol_max_custom > 0:
+            screen_mask &= relvol_values <= relvol_max_custom
+
+    if momentum_available and momentum_filter_mode == "구간 선택":
+        momentum_values = candidates[momentum_metric].to_numpy()
+        momentum_min, momentum_max = MOMENTUM_BUCKETS.get(momentum_bucket, (None, None))
+        screen_mask &= ~np.isnan(momentum_values)
+        if momentum_min is not None:
+            screen_mask &= momentum_values >= momentum_min
+        if momentum_max is not None:
+            screen_mask &= momentum_values <= momentum_max
+    elif momentum_available and momentum_filter_mode == "직접 입력":
+        momentum_values = candidates[momentum_metric].to_numpy()
+        screen_mask &= ~np.isnan(momentum_values)
+        if momentum_min_custom != 0:
+            screen_mask &= momentum_values >= momentum_min_custom
+        if momentum_max_custom != 0:
+            screen_mask &= momentum_values <= momentum_max_custom
+
+    if avg_value_available and value_filter_mode == "구간 선택":
+        avg_value_values = candidates["avg_value_20d"].to_numpy()
+        value_min, value_max = VALUE_BUCKETS.get(value_bucket, (None, None))
+        screen_mask &= ~np.isnan(avg_value_values)
+        if value_min is not None:
+            screen_mask &= avg_value_values >= value_min
+        if value_max is not None:
+            screen_mask &= avg_value_values < value_max
+    elif avg_value_available and value_filter_mode == "직접 입력":
+        avg_value_values = candidates["avg_value_20d"].to_numpy()
+        screen_mask &= ~np.isnan(avg_value_values)
+        if value_min_custom > 0:
+            screen_mask &= avg_value_values >= value_min_custom
+        if value_max_custom > 0:
+            screen_mask &= avg_value_values <= value_max_custom
+    for flag_key, col, op, threshold_key, positive_only in THRESHOLD_FILTERS:
+        if not st.session_state.get(flag_key):
+            continue
+        threshold_values = candidates[col].to_numpy()
+        screen_mask &= THRESHOLD_COMPARATORS[op](threshold_values, st.session_state[threshold_key])
+        if positive_only:
+            screen_mask &= threshold_values > 0
+    if apply_eps_positive:
+        screen_mask &= candidates["eps_positive_b"].to_numpy()
+    if fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode == "구간 선택":
+        ev_ebitda_values = candidates["ev_ebitda"].to_numpy()
+        ev_ebitda_min, ev_ebitda_max = EV_EBITDA_BUCKETS.get(ev_ebitda_bucket, (None, None))
+        screen_mask &= ~np.isnan(ev_ebitda_values)
+        if ev_ebitda_min is not None:
+            screen_mask &= ev_ebitda_values >= ev_ebitda_min
+        if ev_ebitda_max is not None:
+            screen_mask &= ev_ebitda_values <= ev_ebitda_max
+    elif fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode == "직접 입력":
+        ev_ebitda_values = candidates["ev_ebitda"].to_numpy()
+        screen_mask &= ~np.isnan(ev_ebitda_values)
+        if ev_ebitda_min_custom != 0:
+            screen_mask &= ev_ebitda_values >= ev_ebitda_min_custom
+        if ev_ebitda_max_custom != 0:
+            screen_mask &= ev_ebitda_values <= ev_ebitda_max_custom
+    if technical_metric_availability["rsi_14"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="rsi_14",
+            mode=st.session_state.get("rsi_filter_mode", "Any"),
+            bucket=st.session_state.get("rsi_bucket", "전체"),
+            bucket_map=RSI_BUCKETS,
+            min_custom=st.session_state.get("rsi_min_custom", 0.0),
+            max_custom=st.session_state.get("rsi_max_custom", 0.0),
+        )
+    if technical_metric_availability["dist_sma20"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="dist_sma20",
+            mode=st.session_state.get("dist_sma20_filter_mode", "Any"),
+            bucket=st.session_state.get("dist_sma20_bucket", "전체"),
+            bucket_map=DIST_SMA_BUCKETS,
+            min_custom=st.session_state.get("dist_sma20_min_custom", 0.0),
+            max_custom=st.session_state.get("dist_sma20_max_custom", 0.0),
+        )
+    if technical_metric_availability["dist_sma50"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="dist_sma50",
+            mode=st.session_state.get("dist_sma50_filter_mode", "Any"),
+            bucket=st.session_state.get("dist_sma50_bucket", "전체"),
+            bucket_map=DIST_SMA_BUCKETS,
+            min_custom=st.session_state.get("dist_sma50_min_custom", 0.0),
+            max_custom=st.session_state.get("dist_sma50_max_custom", 0.0),
+        )
+    if technical_metric_availability["dist_sma200"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="dist_sma200",
+            mode=st.session_state.get("dist_sma200_filter_mode", "Any"),
+            bucket=st.session_state.get("dist_sma200_bucket", "전체"),
+            bucket_map=DIST_SMA_BUCKETS,
+            min_custom=st.session_state.get("dist_sma200_min_custom", 0.0),
+            max_custom=st.session_state.get("dist_sma200_max_custom", 0.0),
+        )
+    if technical_metric_availability["near_52w_high_ratio"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="near_52w_high_ratio",
+            mode=st.session_state.get("near_high_filter_mode", "Any"),
+            bucket=st.session_state.get("near_high_bucket", "전체"),
+            bucket_map=NEAR_HIGH_BUCKETS,
+            min_custom=st.session_state.get("near_high_min_custom", 0.0),
+            max_custom=st.session_state.get("near_high_max_custom", 0.0),
+        )
+    if technical_metric_availability["pos_52w"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="pos_52w",
+            mode=st.session_state.get("near_low_filter_mode", "Any"),
+            bucket=st.session_state.get("near_low_bucket", "전체"),
+            bucket_map=NEAR_LOW_BUCKETS,
+            min_custom=st.session_state.get("near_low_min_custom", 0.0),
+            max_custom=st.session_state.get("near_low_max_custom", 0.0),
+        )
+    if technical_metric_availability["atr_14"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="atr_14",
+            mode=st.session_state.get("atr_filter_mode", "Any"),
+            bucket=st.session_state.get("atr_bucket", "전체"),
+            bucket_map=ATR_BUCKETS,
+            min_custom=st.session_state.get("atr_min_custom", 0.0),
+            max_custom=st.session_state.get("atr_max_custom", 0.0),
+        )
+    if technical_metric_availability["gap_pct"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="gap_pct",
+            mode=st.session_state.get("gap_filter_mode", "Any"),
+            bucket=st.session_state.get("gap_bucket", "전체"),
+            bucket_map=GAP_BUCKETS,
+            min_custom=st.session_state.get("gap_min_custom", 0.0),
+            max_custom=st.session_state.get("gap_max_custom", 0.0),
+        )
+    if technical_metric_availability["chg_from_open_pct"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="chg_from_open_pct",
+            mode=st.session_state.get("chg_open_filter_mode", "Any"),
+            bucket=st.session_state.get("chg_open_bucket", "전체"),
+            bucket_map=CHG_OPEN_BUCKETS,
+            min_custom=st.session_state.get("chg_open_min_custom", 0.0),
+            max_custom=st.session_state.get("chg_open_max_custom", 0.0),
+        )
+    if technical_metric_availability["volatility_20d"]:
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col="volatility_20d",
+            mode=st.session_state.get("volatility_filter_mode", "Any"),
+            bucket=st.session_state.get("volatility_bucket", "전체"),
+            bucket_map=VOLATILITY_BUCKETS,
+            min_custom=st.session_state.get("volatility_min_custom", 0.0),
+            max_custom=st.session_state.get("volatility_max_custom", 0.0),
+        )
+    selected_foreign_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+    st.session_state.foreign_buy_metric = selected_foreign_metric
+    if technical_metric_availability.get(selected_foreign_metric, False):
+        _apply_range_mode_mask(
+            screen_mask,
+            candidates,
+            col=selected_foreign_metric,
+            mode=st.session_state.get("foreign_buy_filter_mode", "Any"),
+            bucket=st.session_state.get("foreign_buy_bucket", "전체"),
+            bucket_map=FOREIGN_BUY_METRIC_CONFIGS.get(
+                selected_foreign_metric,
+                FOREIGN_BUY_METRIC_CONFIGS["foreign_net_buy_value_20d"],
+            )["bucket_options"],
+            min_custom=st.session_state.get("foreign_buy_min_custom", 0.0),
+            max_custom=st.session_state.get("foreign_buy_max_custom", 0.0),
+            exclude_zero=True,
+        )
+    if apply_has_price_5y and "has_price_5y" in candidates.columns:
+        screen_mask &= candidates["has_price_5y"].to_numpy() == 1
+    if apply_has_price_10y and "has_price_10y" in candidates.columns:
+        screen_mask &= candidates["has_price_10y"].to_numpy() == 1
+    # No active filter leaves the mask all-True; skip the full-frame take in that case.
+    filtered = candidates if screen_mask.all() else candidates.iloc[screen_mask]
+    sort_candidates = [
+        "mcap", "pbr", "reserve_ratio", "roe_proxy", "ret_3m", "ret_6m", "ret_1y", "near_52w_high_ratio", "pos_52w", "div",
+        "avg_value_20d", "current_value", "relative_value", "ev_ebitda", "eps_cagr_5y", "eps_yoy_q", "eps_qoq", "sales_growth_qoq", "sales_growth_ttm", "sales_cagr_5y",
+        "rsi_14", "dist_sma20", "dist_sma50", "dist_sma200", "atr_14", "gap_pct", "chg_from_open_pct", "volatility_20d",
+        "foreign_net_buy_volume", "foreign_net_buy_volume_20d", "foreign_net_buy_volume_60d", "foreign_net_buy_value", "foreign_net_buy_value_20d", "foreign_net_buy_value_60d", "foreign_net_buy_value_20d_mcap_ratio", "foreign_net_buy_value_60d_mcap_ratio",
+    ]
+    selected_sort_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+    if selected_sort_metric in sort_candidates:
+        sort_candidates = [selected_sort_metric] + [candidate for candidate in sort_candidates if candidate != selected_sort_metric]
+
+    sort_col = st.selectbox(
+        "정렬 컬럼",
+        sort_candidates,
+        key="sort_col",
     )
-if st.session_state.get("foreign_buy_filter_mode") != "Any":
-    foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
-    foreign_buy_metric_name, foreign_buy_metric_unit = FOREIGN_BUY_METRICS.get(
-        foreign_buy_metric,
-        FOREIGN_BUY_METRICS["foreign_net_buy_value_20d"],
+    ascending = st.checkbox("오름차순", key="ascending")
+    limit = st.slider("출력 개수", min_value=10, max_value=500, step=10, key="limit")
+
+    effective_ascending = ascending
+    if apply_pbr_max and sort_col == "pbr":
+        effective_ascending = True
+        if not ascending:
+            st.caption("최대 PBR 적용 시에는 저PBR 탐색을 위해 PBR 오름차순으로 정렬합니다.")
+
+    # Most reruns (sorting, downloads, job buttons) leave every filter untouched; compare the raw
+    # widget state first and only serialize/prune when it changed.
+    raw_filter_key = tuple(
+        tuple(value) if isinstance(value, list) else value
+        for value in (st.session_state.get(spec.name, spec.default) for spec in FILTER_SPECS)
     )
-    condition_summaries.append(
-        f"{foreign_buy_metric_name}({foreign_buy_metric_unit}) {_format_range_summary(st.session_state.get('foreign_buy_filter_mode', 'Any'), st.session_state.get('foreign_buy_bucket', '전체'), st.session_state.get('foreign_buy_min_custom', 0.0), st.session_state.get('foreign_buy_max_custom', 0.0))}"
+    if st.session_state.get("_last_filter_key") != raw_filter_key:
+        query_filter_state: dict[str, Any] = {
+            spec.name: serialized
+            for spec, serializer in SPEC_SERIALIZERS
+            if (serialized := serializer(st.session_state.get(spec.name, spec.default))) is not None
+        }
+
+        query_filter_state = prune_query_filter_state(query_filter_state, st.session_state)
+        query_state_key = tuple(
+            sorted(
+                (key, tuple(value) if isinstance(value, list) else value)
+                for key, value in query_filter_state.items()
+            )
+        )
+
+        # Rewriting st.query_params costs a browser URL sync, so only do it when the state actually changed.
+        # Comparing the key itself (not its hash) rules out collisions silently skipping a URL update.
+        if st.session_state.get("_last_qp_key") != query_state_key:
+            _set_query_params(query_filter_state)
+            st.session_state._last_qp_key = query_state_key
+            st.session_state._last_qp_str = urlencode(query_filter_state, doseq=True)
+        st.session_state._last_filter_key = raw_filter_key
+
+    st.caption("필터 상태가 URL에 자동 반영됩니다. 링크를 복사해 동일한 조건을 공유할 수 있습니다.")
+    with st.expander("공유 링크"):
+        _render_share_link(st.session_state._last_qp_str)
+
+    top_positions = _top_k_positions(filtered[sort_col].to_numpy(), limit, ascending=effective_ascending)
+    # Take the result rows and display columns in one step; the table and the CSV share this frame.
+    display_df = filtered.iloc[top_positions, filtered.columns.get_indexer(SCREEN_RESULT_COLUMNS)]
+
+    if ticker_list:
+        st.caption(f"티커 직접 입력: {len(ticker_list)}개 중 {len(ticker_list) - len(missing_tickers)}개 매칭")
+        if missing_tickers:
+            st.warning("snapshot에 없는 티커: " + ", ".join(missing_tickers))
+
+    if display_df.empty:
+        st.warning("조건을 만족하는 종목이 없습니다. Growth 조건(EPS CAGR/EPS YoY) 임계값을 낮추거나 체크를 해제해 보세요.")
+
+    condition_summaries: list[str] = []
+    if ticker_list:
+        condition_summaries.append(f"티커 {len(ticker_list)}")
+    if mkt:
+        condition_summaries.append(f"시장 {', '.join(mkt)}")
+    if mcap_filter_mode != "Any":
+        condition_summaries.append(f"시총 {_format_range_summary(mcap_filter_mode, mcap_bucket, mcap_min_custom, mcap_max_custom)}")
+    if price_filter_mode != "Any":
+        condition_summaries.append(f"가격 {_format_range_summary(price_filter_mode, price_bucket, price_min_custom, price_max_custom)}")
+    if div_filter_mode != "Any":
+        condition_summaries.append(f"배당 {_format_range_summary(div_filter_mode, div_bucket, div_min_custom, div_max_custom)}")
+    if avg_value_available and value_filter_mode != "Any":
+        condition_summaries.append(
+            f"평균 거래대금(20D) {_format_range_summary(value_filter_mode, value_bucket, value_min_custom, value_max_custom)}"
+        )
+    if relative_value_available and relvol_filter_mode != "Any":
+        condition_summaries.append(
+            f"상대거래량(현재/20D) {_format_range_summary(relvol_filter_mode, relvol_bucket, relvol_min_custom, relvol_max_custom)}"
+        )
+    if momentum_available and momentum_filter_mode != "Any":
+        condition_summaries.append(
+            f"{MOMENTUM_METRICS.get(momentum_metric, momentum_metric)} {_format_range_summary(momentum_filter_mode, momentum_bucket, momentum_min_custom, momentum_max_custom)}"
+        )
+    if fundamental_metric_availability["ev_ebitda"] and ev_ebitda_filter_mode != "Any":
+        condition_summaries.append(
+            f"EV/EBITDA {_format_range_summary(ev_ebitda_filter_mode, ev_ebitda_bucket, ev_ebitda_min_custom, ev_ebitda_max_custom)}"
+        )
+    if st.session_state.get("rsi_filter_mode") != "Any":
+        condition_summaries.append(
+            f"RSI(14) {_format_range_summary(st.session_state.get('rsi_filter_mode', 'Any'), st.session_state.get('rsi_bucket', '전체'), st.session_state.get('rsi_min_custom', 0.0), st.session_state.get('rsi_max_custom', 0.0))}"
+        )
+    if st.session_state.get("dist_sma20_filter_mode") != "Any":
+        condition_summaries.append(
+            f"20일선 대비 {_format_range_summary(st.session_state.get('dist_sma20_filter_mode', 'Any'), st.session_state.get('dist_sma20_bucket', '전체'), st.session_state.get('dist_sma20_min_custom', 0.0), st.session_state.get('dist_sma20_max_custom', 0.0))}"
+        )
+    if st.session_state.get("dist_sma50_filter_mode") != "Any":
+        condition_summaries.append(
+            f"50일선 대비 {_format_range_summary(st.session_state.get('dist_sma50_filter_mode', 'Any'), st.session_state.get('dist_sma50_bucket', '전체'), st.session_state.get('dist_sma50_min_custom', 0.0), st.session_state.get('dist_sma50_max_custom', 0.0))}"
+        )
+    if st.session_state.get("dist_sma200_filter_mode") != "Any":
+        condition_summaries.append(
+            f"200일선 대비 {_format_range_summary(st.session_state.get('dist_sma200_filter_mode', 'Any'), st.session_state.get('dist_sma200_bucket', '전체'), st.session_state.get('dist_sma200_min_custom', 0.0), st.session_state.get('dist_sma200_max_custom', 0.0))}"
+        )
+    if st.session_state.get("near_high_filter_mode") != "Any":
+        condition_summaries.append(
+            f"52주 High 근접 {_format_range_summary(st.session_state.get('near_high_filter_mode', 'Any'), st.session_state.get('near_high_bucket', '전체'), st.session_state.get('near_high_min_custom', 0.0), st.session_state.get('near_high_max_custom', 0.0))}"
+        )
+    if st.session_state.get("near_low_filter_mode") != "Any":
+        condition_summaries.append(
+            f"52주 Low 근접 {_format_range_summary(st.session_state.get('near_low_filter_mode', 'Any'), st.session_state.get('near_low_bucket', '전체'), st.session_state.get('near_low_min_custom', 0.0), st.session_state.get('near_low_max_custom', 0.0))}"
+        )
+    if st.session_state.get("atr_filter_mode") != "Any":
+        condition_summaries.append(
+            f"ATR(14) {_format_range_summary(st.session_state.get('atr_filter_mode', 'Any'), st.session_state.get('atr_bucket', '전체'), st.session_state.get('atr_min_custom', 0.0), st.session_state.get('atr_max_custom', 0.0))}"
+        )
+    if st.session_state.get("gap_filter_mode") != "Any":
+        condition_summaries.append(
+            f"Gap% {_format_range_summary(st.session_state.get('gap_filter_mode', 'Any'), st.session_state.get('gap_bucket', '전체'), st.session_state.get('gap_min_custom', 0.0), st.session_state.get('gap_max_custom', 0.0))}"
+        )
+    if st.session_state.get("chg_open_filter_mode") != "Any":
+        condition_summaries.append(
+            f"시가대비 등락률 {_format_range_summary(st.session_state.get('chg_open_filter_mode', 'Any'), st.session_state.get('chg_open_bucket', '전체'), st.session_state.get('chg_open_min_custom', 0.0), st.session_state.get('chg_open_max_custom', 0.0))}"
+        )
+    if st.session_state.get("volatility_filter_mode") != "Any":
+        condition_summaries.append(
+            f"변동성(20D) {_format_range_summary(st.session_state.get('volatility_filter_mode', 'Any'), st.session_state.get('volatility_bucket', '전체'), st.session_state.get('volatility_min_custom', 0.0), st.session_state.get('volatility_max_custom', 0.0))}"
+        )
+    if st.session_state.get("foreign_buy_filter_mode") != "Any":
+        foreign_buy_metric = _foreign_metric_for_window(int(st.session_state.get("foreign_buy_window", 20)))
+        foreign_buy_metric_name, foreign_buy_metric_unit = FOREIGN_BUY_METRICS.get(
+            foreign_buy_metric,
+            FOREIGN_BUY_METRICS["foreign_net_buy_value_20d"],
+        )
+        condition_summaries.append(
+            f"{foreign_buy_metric_name}({foreign_buy_metric_unit}) {_format_range_summary(st.session_state.get('foreign_buy_filter_mode', 'Any'), st.session_state.get('foreign_buy_bucket', '전체'), st.session_state.get('foreign_buy_min_custom', 0.0), st.session_state.get('foreign_buy_max_custom', 0.0))}"
+        )
+    if st.session_state.get("apply_eps_qoq"):
+        condition_summaries.append(f"EPS Q/Q ≥ {st.session_state.get('eps_qoq_min', 0):.2f}")
+    if st.session_state.get("apply_sales_growth_qoq"):
+        condition_summaries.append(f"Sales Q/Q ≥ {st.session_state.get('sales_growth_qoq_min', 0):.2f}")
+    if st.session_state.get("apply_sales_growth_ttm"):
+        condition_summaries.append(f"Sales TTM ≥ {st.session_state.get('sales_growth_ttm_min', 0):.2f}")
+    if st.session_state.get("apply_sales_cagr_5y"):
+        condition_summaries.append(f"Sales CAGR 5Y ≥ {st.session_state.get('sales_cagr_5y_min', 0):.2f}")
+    if st.session_state.get("apply_has_price_5y"):
+        condition_summaries.append("가격 5Y 커버리지")
+    if st.session_state.get("apply_has_price_10y"):
+        condition_summaries.append("가격 10Y 커버리지")
+
+    if condition_summaries:
+        st.caption("현재 조건: " + " • ".join(condition_summaries))
+
+    st.dataframe(
+        display_df,
+        width="stretch",
+        hide_index=True,
+        column_config={
+            "avg_value_20d": st.column_config.NumberColumn("평균 거래대금(20D)", format="%,d"),
+            "current_value": st.column_config.NumberColumn("현재 거래대금", format="%,d"),
+            "relative_value": st.column_config.NumberColumn(
+                "상대거래량 (현재/20D)",
+                format="%.2fx",
+                help="상대거래량 = current_value / avg_value_20d",
+            ),
+            "rsi_14": st.column_config.NumberColumn("RSI(14)", format="%.2f"),
+            "dist_sma20": st.column_config.NumberColumn("20MA 대비", format="%.2f"),
+            "dist_sma50": st.column_config.NumberColumn("50MA 대비", format="%.2f"),
+            "dist_sma200": st.column_config.NumberColumn("200MA 대비", format="%.2f"),
+            "atr_14": st.column_config.NumberColumn("ATR(14)", format="%.2f"),
+            "gap_pct": st.column_config.NumberColumn("Gap%", format="%.2f"),
+            "chg_from_open_pct": st.column_config.NumberColumn("시가대비%", format="%.2f"),
+            "volatility_20d": st.column_config.NumberColumn("변동성(20D)", format="%.2f"),
+            "foreign_net_buy_volume": st.column_config.NumberColumn("외국인 순매수량", format="%,d"),
+            "foreign_net_buy_volume_20d": st.column_config.NumberColumn(
+                "외국인 순매수량(20D)",
+                format="%,d",
+                help="당일 외국인 순매수량이 결측이면 20D 누적도 결측으로 표시",
+            ),
+            "foreign_net_buy_value": st.column_config.NumberColumn("외국인 순매수금액(당일)", format="%,d"),
+            "foreign_net_buy_volume_60d": st.column_config.NumberColumn(
+                "외국인 순매수량(60D)",
+                format="%,d",
+                help="당일 외국인 순매수량이 결측이면 60D 누적도 결측으로 표시",
+            ),
+            "foreign_net_buy_value_20d": st.column_config.NumberColumn(
+                "외국인 순매수금액(20D 누적)",
+                format="%,d",
+                help="당일 외국인 순매수금액이 결측이면 20D 누적도 결측으로 표시",
+            ),
+            "foreign_net_buy_value_60d": st.column_config.NumberColumn(
+                "외국인 순매수금액(60D 누적)",
+                format="%,d",
+                help="당일 외국인 순매수금액이 결측이면 60D 누적도 결측으로 표시",
+            ),
+            "foreign_net_buy_value_20d_mcap_ratio": st.column_config.NumberColumn(
+                "외국인 순매수강도(20D/시총)",
+                format="%.2f%%",
+                help="외국인 순매수 20D 누적금액 / 시가총액 × 100",
+            ),
+            "foreign_net_buy_value_60d_mcap_ratio": st.column_config.NumberColumn(
+                "외국인 순매수강도(60D/시총)",
+                format="%.2f%%",
+                help="외국인 순매수 60D 누적금액 / 시가총액 × 100",
+            ),
+        },
     )
-if st.session_state.get("apply_eps_qoq"):
-    condition_summaries.append(f"EPS Q/Q ≥ {st.session_state.get('eps_qoq_min', 0):.2f}")
-if st.session_state.get("apply_sales_growth_qoq"):
-    condition_summaries.append(f"Sales Q/Q ≥ {st.session_state.get('sales_growth_qoq_min', 0):.2f}")
-if st.session_state.get("apply_sales_growth_ttm"):
-    condition_summaries.append(f"Sales TTM ≥ {st.session_state.get('sales_growth_ttm_min', 0):.2f}")
-if st.session_state.get("apply_sales_cagr_5y"):
-    condition_summaries.append(f"Sales CAGR 5Y ≥ {st.session_state.get('sales_cagr_5y_min', 0):.2f}")
-if st.session_state.get("apply_has_price_5y"):
-    condition_summaries.append("가격 5Y 커버리지")
-if st.session_state.get("apply_has_price_10y"):
-    condition_summaries.append("가격 10Y 커버리지")
-
-if condition_summaries:
-    st.caption("현재 조건: " + " • ".join(condition_summaries))
-
-show_cols = [
-    "ticker", "name", "market", "close", "mcap", "avg_value_20d", "current_value", "relative_value", "pbr", "reserve_ratio", "per", "div", "dps",
-    "eps", "bps", "fiscal_period", "period_type", "reported_date", "consolidation_type", "financial_source", "roe_proxy", "eps_positive", "ret_3m", "ret_6m", "ret_1y",
-    "rsi_14", "dist_sma20", "dist_sma50", "dist_sma200", "pos_52w", "near_52w_high_ratio", "atr_14", "gap_pct", "chg_from_open_pct", "volatility_20d",
-    "foreign_net_buy_volume", "foreign_net_buy_volume_20d", "foreign_net_buy_volume_60d", "foreign_net_buy_value", "foreign_net_buy_value_20d", "foreign_net_buy_value_60d", "foreign_net_buy_value_20d_mcap_ratio", "foreign_net_buy_value_60d_mcap_ratio",
-    "eps_cagr_5y", "eps_yoy_q", "eps_qoq", "sales_growth_qoq", "sales_growth_ttm", "sales_cagr_5y", "pe_ratio", "forward_pe", "ps_ratio", "pb_ratio", "peg_ratio", "ev_sales", "ev_ebitda", "gross_margin", "operating_margin", "net_margin", "roa", "roe", "roic", "debt_equity", "lt_debt_equity", "current_ratio", "quick_ratio", "payout_ratio", "has_price_5y", "has_price_10y",
-]
 
-for col in show_cols:
-    if col not in filtered.columns:
-        filtered[col] = pd.NA
-
-st.dataframe(
-    filtered[show_cols],
-    width="stretch",
-    hide_index=True,
-    column_config={
-        "avg_value_20d": st.column_config.NumberColumn("평균 거래대금(20D)", format="%,d"),
-        "current_value": st.column_config.NumberColumn("현재 거래대금", format="%,d"),
-        "relative_value": st.column_config.NumberColumn(
-            "상대거래량 (현재/20D)",
-            format="%.2fx",
-            help="상대거래량 = current_value / avg_value_20d",
-        ),
-        "rsi_14": st.column_config.NumberColumn("RSI(14)", format="%.2f"),
-        "dist_sma20": st.column_config.NumberColumn("20MA 대비", format="%.2f"),
-        "dist_sma50": st.column_config.NumberColumn("50MA 대비", format="%.2f"),
-        "dist_sma200": st.column_config.NumberColumn("200MA 대비", format="%.2f"),
-        "atr_14": st.column_config.NumberColumn("ATR(14)", format="%.2f"),
-        "gap_pct": st.column_config.NumberColumn("Gap%", format="%.2f"),
-        "chg_from_open_pct": st.column_config.NumberColumn("시가대비%", format="%.2f"),
-        "volatility_20d": st.column_config.NumberColumn("변동성(20D)", format="%.2f"),
-        "foreign_net_buy_volume": st.column_config.NumberColumn("외국인 순매수량", format="%,d"),
-        "foreign_net_buy_volume_20d": st.column_config.NumberColumn(
-            "외국인 순매수량(20D)",
-            format="%,d",
-            help="당일 외국인 순매수량이 결측이면 20D 누적도 결측으로 표시",
-        ),
-        "foreign_net_buy_value": st.column_config.NumberColumn("외국인 순매수금액(당일)", format="%,d"),
-        "foreign_net_buy_volume_60d": st.column_config.NumberColumn(
-            "외국인 순매수량(60D)",
-            format="%,d",
-            help="당일 외국인 순매수량이 결측이면 60D 누적도 결측으로 표시",
-        ),
-        "foreign_net_buy_value_20d": st.column_config.NumberColumn(
-            "외국인 순매수금액(20D 누적)",
-            format="%,d",
-            help="당일 외국인 순매수금액이 결측이면 20D 누적도 결측으로 표시",
-        ),
-        "foreign_net_buy_value_60d": st.column_config.NumberColumn(
-            "외국인 순매수금액(60D 누적)",
-            format="%,d",
-            help="당일 외국인 순매수금액이 결측이면 60D 누적도 결측으로 표시",
-        ),
-        "foreign_net_buy_value_20d_mcap_ratio": st.column_config.NumberColumn(
-            "외국인 순매수강도(20D/시총)",
-            format="%.2f%%",
-            help="외국인 순매수 20D 누적금액 / 시가총액 × 100",
-        ),
-        "foreign_net_buy_value_60d_mcap_ratio": st.column_config.NumberColumn(
-            "외국인 순매수강도(60D/시총)",
-            format="%.2f%%",
-            help="외국인 순매수 60D 누적금액 / 시가총액 × 100",
-        ),
-    },
-)
+    csv = _csv_bytes(db_path, asof, db_mtime, tuple(display_df["ticker"].tolist()), display_df)
+    st.download_button("CSV 다운로드", data=csv, file_name=f"screener_{asof}.csv", mime="text/csv")
+
 
-csv = filtered[show_cols].to_csv(index=False).encode("utf-8-sig")
-st.download_button("CSV 다운로드", data=csv, file_name=f"screener_{asof}.csv", mime="text/csv")
+_render_screen(base, snapshot_meta, asof)
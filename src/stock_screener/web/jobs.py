@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any
+
+from stock_screener.pipelines.daily_batch import BatchCancelledError, DailyBatchPipeline
+
+
+def run_job(
+    db_path: str,
+    job_type: str,
+    asof_date: str | None,
+    lookback_days: int,
+    run_options: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Run one UI background job and return its result message.
+
+    Lives outside the Streamlit script so a spawned worker process can import it.
+    """
+    run_options = run_options or {}
+
+    def should_cancel() -> bool:
+        cancel_flag = run_options.get("cancel_flag_path")
+        return bool(cancel_flag) and Path(cancel_flag).exists()
+
+    try:
+        worker_pipeline = DailyBatchPipeline(Path(db_path))
+        if job_type in {"full_refresh", "initial_backfill"}:
+            initial_backfill = job_type == "initial_backfill"
+            if run_options.get("chunked_snapshot_strategy"):
+                result = worker_pipeline.run(
+                    asof_date=None,
+                    lookback_days=lookback_days,
+                    initial_backfill=initial_backfill,
+                    chunk_years=2,
+                    chunks=5,
+                    rebuild_snapshot=False,
+                    should_cancel=should_cancel,
+                )
+                snap_result = worker_pipeline.rebuild_snapshot_only(
+                    asof_date=result.asof_date,
+                    lookback_days=lookback_days,
+                )
+                return {
+                    "status": "success",
+                    "job_type": job_type,
+                    "result": result.__dict__,
+                    "chunks_done": 5,
+                    "total_chunks": 5,
+                    "snapshot_rebuilt": True,
+                    "snapshot_rows": snap_result.snapshot,
+                }
+
+            result = worker_pipeline.run(
+                asof_date=None,
+                lookback_days=lookback_days,
+                initial_backfill=initial_backfill,
+                should_cancel=should_cancel,
+            )
+            return {
+                "status": "success",
+                "job_type": job_type,
+                "result": result.__dict__,
+                "chunks_done": 1,
+                "total_chunks": 1,
+                "snapshot_rebuilt": True,
+                "snapshot_rows": result.snapshot,
+            }
+
+        if job_type in {"snapshot_refresh", "auto_snapshot_sync"}:
+            result = worker_pipeline.rebuild_snapshot_only(asof_date=asof_date, lookback_days=lookback_days)
+            return {"status": "success", "job_type": job_type, "result": result.__dict__}
+
+        if job_type == "reserve_refresh":
+            updated_asof, updated_rows = worker_pipeline.update_reserve_ratio_only(asof_date=asof_date)
+            snap_result = worker_pipeline.rebuild_snapshot_only(asof_date=updated_asof, lookback_days=lookback_days)
+            return {
+                "status": "success",
+                "job_type": job_type,
+                "updated_asof": updated_asof,
+                "updated_rows": updated_rows,
+                "snapshot_rows": snap_result.snapshot,
+            }
+
+        return {"status": "error", "job_type": job_type, "error": f"Unknown job type: {job_type}"}
+    except BatchCancelledError as exc:
+        return {"status": "cancelled", "job_type": job_type, "message": str(exc)}
+    except Exception as exc:  # noqa: BLE001
+        return {"status": "error", "job_type": job_type, "error": str(exc)}
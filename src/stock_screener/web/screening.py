@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+# Ratio-style filter columns stored as float32: thresholds are compared in float32 as well, so
+# bucket boundaries stay consistent. KRW amounts (mcap, close, eps, ...) stay float64 because
+# they exceed float32's 24-bit mantissa and would be displayed/exported with rounding errors.
+FLOAT32_SNAPSHOT_COLUMNS: tuple[str, ...] = (
+    "pbr",
+    "per",
+    "div",
+    "roe_proxy",
+    "relative_value",
+    "ret_3m",
+    "ret_6m",
+    "ret_1y",
+    "ev_ebitda",
+    "dist_sma20",
+    "dist_sma50",
+    "dist_sma200",
+    "pos_52w",
+    "near_52w_high_ratio",
+    "eps_cagr_5y",
+    "eps_yoy_q",
+    "eps_qoq",
+    "sales_growth_qoq",
+    "sales_growth_ttm",
+    "sales_cagr_5y",
+    "reserve_ratio",
+    "rsi_14",
+    "gap_pct",
+    "chg_from_open_pct",
+    "volatility_20d",
+    "foreign_net_buy_value_20d_mcap_ratio",
+    "foreign_net_buy_value_60d_mcap_ratio",
+)
+# Remaining screen filter columns are coerced to float64 so filters can compare raw ndarrays:
+# NaN compares False, which replaces the separate notna() pass, and all-NULL columns no longer
+# arrive as object dtype.
+FLOAT64_FILTER_COLUMNS: tuple[str, ...] = (
+    "mcap",
+    "close",
+    "avg_value_20d",
+    "atr_14",
+    "foreign_net_buy_value_20d",
+    "foreign_net_buy_value_60d",
+)
+
+
+def prepare_snapshot_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Add derived screen columns and compact dtypes on a freshly loaded snapshot frame."""
+    if "foreign_net_buy_value_20d_mcap_ratio" not in frame.columns:
+        frame["foreign_net_buy_value_20d_mcap_ratio"] = pd.NA
+    if "foreign_net_buy_value_60d_mcap_ratio" not in frame.columns:
+        frame["foreign_net_buy_value_60d_mcap_ratio"] = pd.NA
+    mcap_ratio_mask_20d = (
+        frame["foreign_net_buy_value_20d"].notna()
+        & frame["mcap"].notna()
+        & (frame["mcap"] != 0)
+    )
+    frame.loc[mcap_ratio_mask_20d, "foreign_net_buy_value_20d_mcap_ratio"] = (
+        frame.loc[mcap_ratio_mask_20d, "foreign_net_buy_value_20d"]
+        / frame.loc[mcap_ratio_mask_20d, "mcap"]
+        * 100.0
+    )
+    mcap_ratio_mask_60d = (
+        "foreign_net_buy_value_60d" in frame.columns
+        and frame["foreign_net_buy_value_60d"].notna().any()
+    )
+    if mcap_ratio_mask_60d:
+        ratio_mask_60d = (
+            frame["foreign_net_buy_value_60d"].notna()
+            & frame["mcap"].notna()
+            & (frame["mcap"] != 0)
+        )
+        frame.loc[ratio_mask_60d, "foreign_net_buy_value_60d_mcap_ratio"] = (
+            frame.loc[ratio_mask_60d, "foreign_net_buy_value_60d"]
+            / frame.loc[ratio_mask_60d, "mcap"]
+            * 100.0
+        )
+
+    for col in FLOAT32_SNAPSHOT_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype("float32")
+    for col in FLOAT64_FILTER_COLUMNS:
+        if col in frame.columns:
+            frame[col] = pd.to_numeric(frame[col], errors="coerce").astype("float64")
+    if "market" in frame.columns:
+        frame["market"] = frame["market"].astype("category")
+
+    # Precompute the EPS-positive mask once so the screen filter is a plain column lookup.
+    frame["eps_positive_b"] = frame["eps_positive"].eq(1).to_numpy()
+    if frame["eps_positive"].notna().all():
+        frame["eps_positive"] = frame["eps_positive"].astype("int8")
+    frame["_ticker_norm"] = frame["ticker"].astype(str).str.strip().str.upper()
+    # The column assignments above leave many single-column blocks; copy once to consolidate them
+    # into contiguous per-dtype blocks for the cached frame.
+    return frame.copy()
+
+
+def apply_range_mode_mask(
+    mask: np.ndarray,
+    frame: pd.DataFrame,
+    *,
+    col: str,
+    mode: str,
+    bucket: str,
+    bucket_map: dict[str, tuple[float | None, float | None]],
+    min_custom: float,
+    max_custom: float,
+    exclude_zero: bool = False,
+) -> None:
+    """AND the `Any / 구간 선택 / 직접 입력` range condition for `col` into `mask` in place."""
+    if mode not in {"구간 선택", "직접 입력"}:
+        return
+    values = frame[col].to_numpy()
+    if mode == "구간 선택":
+        lower, upper = bucket_map.get(bucket, (None, None))
+    else:
+        lower = min_custom if min_custom != 0 else None
+        upper = max_custom if max_custom != 0 else None
+    # Every predicate writes into one scratch buffer and is ANDed in place, so no per-comparison
+    # temporaries are allocated. NaN compares False, so a bound check already drops missing values.
+    scratch = np.empty_like(mask)
+    if lower is None and upper is None:
+        np.isnan(values, out=scratch)
+        np.logical_not(scratch, out=scratch)
+        mask &= scratch
+    if lower is not None:
+        mask &= np.greater_equal(values, lower, out=scratch)
+    if upper is not None:
+        mask &= np.less_equal(values, upper, out=scratch)
+    if exclude_zero:
+        mask &= np.not_equal(values, 0, out=scratch)
+
+
+def category_isin_mask(series: pd.Series, selected: list[str]) -> np.ndarray:
+    """Return `series.isin(selected)` as an ndarray, matching categorical columns on their int codes."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.isin(selected).to_numpy()
+    wanted = series.cat.categories.get_indexer(selected)
+    # Unknown selections map to -1, which is also the code for missing values; drop them first.
+    return np.isin(series.cat.codes.to_numpy(), wanted[wanted >= 0])
+
+
+def top_k_positions(values: np.ndarray, k: int, *, ascending: bool) -> np.ndarray:
+    """Return positions of the first `k` rows in sort order, NaN last (like `sort_values(...).head(k)`)."""
+    values = np.asarray(values, dtype="float64")
+    k = min(int(k), len(values))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    keys = np.where(np.isnan(values), np.inf, values if ascending else -values)
+    if 4 * k >= len(keys):
+        # Partitioning only pays off when k is small relative to the frame; otherwise sort it all.
+        return np.argsort(keys, kind="stable")[:k]
+    positions = np.argpartition(keys, k - 1)[:k]
+    return positions[np.argsort(keys[positions], kind="stable")]
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from stock_screener.pipelines.daily_batch import BatchCancelledError
+from stock_screener.web import jobs
+
+
+class _FakePipeline:
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    def rebuild_snapshot_only(self, asof_date, lookback_days):
+        if asof_date == "cancel":
+            raise BatchCancelledError("stopped")
+        return SimpleNamespace(asof_date=asof_date, snapshot=3)
+
+
+def test_run_job_returns_result_messages(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "DailyBatchPipeline", _FakePipeline)
+    db_path = str(tmp_path / "x.db")
+
+    message = jobs.run_job(db_path, "snapshot_refresh", "2024-01-02", 30)
+    assert message == {
+        "status": "success",
+        "job_type": "snapshot_refresh",
+        "result": {"asof_date": "2024-01-02", "snapshot": 3},
+    }
+
+    cancelled = jobs.run_job(db_path, "auto_snapshot_sync", "cancel", 30)
+    assert cancelled == {"status": "cancelled", "job_type": "auto_snapshot_sync", "message": "stopped"}
+
+    unknown = jobs.run_job(db_path, "bogus", None, 30)
+    assert unknown["status"] == "error"
+    assert unknown["error"] == "Unknown job type: bogus"
+
+
+def test_run_job_reports_pipeline_setup_failure(monkeypatch, tmp_path):
+    def broken_pipeline(db_path):
+        raise RuntimeError("init_db failed")
+
+    monkeypatch.setattr(jobs, "DailyBatchPipeline", broken_pipeline)
+
+    message = jobs.run_job(str(tmp_path / "x.db"), "snapshot_refresh", None, 30)
+    assert message == {"status": "error", "job_type": "snapshot_refresh", "error": "init_db failed"}
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+from stock_screener.web.screening import (
+    apply_range_mode_mask,
+    category_isin_mask,
+    prepare_snapshot_frame,
+    top_k_positions,
+)
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "ticker": ["AAA", "BBB", "CCC", "DDD"],
+            "rsi_14": [25.0, 45.0, None, 75.0],
+            "foreign_net_buy_value_20d": [0.0, 5.0, -3.0, None],
+        }
+    )
+
+
+def _mask(frame: pd.DataFrame, **kwargs) -> list[bool]:
+    mask = np.ones(len(frame), dtype=bool)
+    apply_range_mode_mask(mask, frame, **kwargs)
+    return mask.tolist()
+
+
+def test_apply_range_mode_mask_any_mode_keeps_all_rows_including_nulls():
+    frame = _frame()
+
+    result = _mask(
+        frame,
+        col="rsi_14",
+        mode="Any",
+        bucket="30~50",
+        bucket_map={"30~50": (30.0, 50.0)},
+        min_custom=0.0,
+        max_custom=0.0,
+    )
+
+    assert result == [True, True, True, True]
+
+
+def test_apply_range_mode_mask_bucket_and_custom_modes_match_inclusive_bounds():
+    frame = _frame()
+    bucket_map = {"전체": (None, None), "30~50": (30.0, 50.0)}
+
+    assert _mask(
+        frame, col="rsi_14", mode="구간 선택", bucket="30~50", bucket_map=bucket_map, min_custom=0.0, max_custom=0.0
+    ) == [False, True, False, False]
+    assert _mask(
+        frame, col="rsi_14", mode="구간 선택", bucket="전체", bucket_map=bucket_map, min_custom=0.0, max_custom=0.0
+    ) == [True, True, False, True]
+    assert _mask(
+        frame, col="rsi_14", mode="직접 입력", bucket="전체", bucket_map=bucket_map, min_custom=45.0, max_custom=0.0
+    ) == [False, True, False, True]
+
+
+def test_apply_range_mode_mask_exclude_zero_drops_zero_and_null_rows():
+    frame = _frame()
+
+    result = _mask(
+        frame,
+        col="foreign_net_buy_value_20d",
+        mode="직접 입력",
+        bucket="전체",
+        bucket_map={"전체": (None, None)},
+        min_custom=0.0,
+        max_custom=0.0,
+        exclude_zero=True,
+    )
+
+    assert result == [False, True, True, False]
+
+
+def test_prepare_snapshot_frame_adds_derived_columns_and_compacts_dtypes():
+    frame = pd.DataFrame(
+        {
+            "ticker": [" aaa ", "BBB"],
+            "market": ["KOSPI", "KOSDAQ"],
+            "mcap": [1_000_000_000_000.0, 0.0],
+            "pbr": [0.8, None],
+            "eps_positive": [1, 0],
+            "foreign_net_buy_value_20d": [10_000_000_000.0, 5.0],
+        }
+    )
+
+    prepared = prepare_snapshot_frame(frame)
+
+    assert prepared["_ticker_norm"].tolist() == ["AAA", "BBB"]
+    assert prepared["eps_positive_b"].tolist() == [True, False]
+    assert prepared["eps_positive"].dtype == np.int8
+    assert prepared["pbr"].dtype == np.float32
+    assert prepared["mcap"].dtype == np.float64
+    assert isinstance(prepared["market"].dtype, pd.CategoricalDtype)
+    assert prepared.loc[0, "foreign_net_buy_value_20d_mcap_ratio"] == 1.0
+    assert pd.isna(prepared.loc[1, "foreign_net_buy_value_20d_mcap_ratio"])
+
+
+def test_prepare_snapshot_frame_coerces_all_null_filter_columns_to_float():
+    frame = pd.DataFrame(
+        {
+            "ticker": ["AAA", "BBB"],
+            "mcap": [1.0, 2.0],
+            "eps_positive": [1, None],
+            "foreign_net_buy_value_20d": [None, None],
+            "rsi_14": [None, None],
+        }
+    )
+
+    prepared = prepare_snapshot_frame(frame)
+
+    assert prepared["rsi_14"].dtype == np.float32
+    assert prepared["foreign_net_buy_value_20d"].dtype == np.float64
+    assert prepared["foreign_net_buy_value_20d_mcap_ratio"].dtype == np.float32
+    mask = np.ones(len(prepared), dtype=bool)
+    apply_range_mode_mask(
+        mask,
+        prepared,
+        col="rsi_14",
+        mode="직접 입력",
+        bucket="전체",
+        bucket_map={},
+        min_custom=30.0,
+        max_custom=0.0,
+    )
+    assert mask.tolist() == [False, False]
+
+
+def test_top_k_positions_matches_sort_values_head_with_nan_last():
+    values = pd.Series([3.0, None, 1.0, 5.0, 2.0, None, 4.0])
+
+    for ascending in (True, False):
+        for k in (0, 1, 3, 7, 10):
+            expected = values.sort_values(ascending=ascending, kind="stable").head(k).index.tolist()
+            assert top_k_positions(values.to_numpy(), k, ascending=ascending).tolist() == expected
+
+
+def test_category_isin_mask_matches_isin_and_ignores_unknown_values():
+    series = pd.Series(["KOSPI", "KOSDAQ", None, "KONEX"], dtype="category")
+
+    assert category_isin_mask(series, ["KOSPI", "KONEX"]).tolist() == [True, False, False, True]
+    assert category_isin_mask(series, ["NYSE"]).tolist() == [False, False, False, False]
+    assert category_isin_mask(series.astype(object), ["KOSDAQ"]).tolist() == [False, True, False, False]